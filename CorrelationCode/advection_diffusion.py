@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Deterministic transit time distributions from the 1D advection-
+# dispersion equation of surrogate_simulator.py (see its header for the
+# model, the calibration to the NetLogo means and its range)
+#     dc/dt + d(u c)/dx = d/dx (K dc/dx),   0 < x < L,
+# with both ends closed to dispersion: particles only leave with the flow
+# u c at x = L. For large D the tube becomes a well-mixed tank with the
+# mean residence time A*L/(VELOCITY_FACTOR*Vout), which
+# test_advection_diffusion.py checks.
+# calibrate fits the constants of the surrogate to NETLOGO_MEAN.
+#
+# The equation is discretised with finite volumes (upwind advection) and
+# the resulting linear system is solved exactly in time through the
+# eigen-decomposition of its (symmetrised) tridiagonal matrix
+# (scipy.linalg.eigh_tridiagonal, if installed). The survival function,
+# density, mean and median come out for a whole (Vout, D) grid without
+# replicate noise. The pairs are evaluated in chunks, so the memory of
+# exp(rate*t) stays below MAX_ELEMENTS elements.
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.linalg import eigh_tridiagonal
+    from scipy.optimize import least_squares
+except ImportError:
+    eigh_tridiagonal = None
+    least_squares = None
+
+from surrogate_simulator import (VIN, L, R, VELOCITY_FACTOR, DISPERSION
+                                 , DISPERSION_EXPONENT, NETLOGO_MEAN
+                                 , dispersion, mean_velocity)
+
+
+# Largest number of elements of the exp(rate*t) block of one chunk.
+MAX_ELEMENTS = 2**22
+
+
+def tridiagonal_modes(diagonal, off_diagonal):
+    """
+    This function returns the eigenvalues and eigenvectors (as columns) of
+    a symmetric tridiagonal matrix.
+
+    diagonal: the diagonal (n elements).
+    off_diagonal: the off-diagonal (n - 1 elements).
+    """
+    if eigh_tridiagonal is not None:
+        return eigh_tridiagonal(diagonal, off_diagonal)
+    return np.linalg.eigh(np.diag(diagonal) + np.diag(off_diagonal, 1)
+                          + np.diag(off_diagonal, -1))
+
+
+def transit_modes(Vout, D, Vin = VIN, L = L, R = R, n_cells = 200
+                  , velocity_factor = VELOCITY_FACTOR
+                  , coefficient = DISPERSION
+                  , exponent = DISPERSION_EXPONENT):
+    """
+    This function discretises the equation for every (Vout, D) pair and
+    returns the decay rates (eigenvalues, all negative) and amplitudes of
+    the survival function
+        S(t) = sum_k amplitude_k exp(rate_k t),
+    which is the fraction of particles still in the tube at time t after
+    a unit pulse entered at x = 0. Both arrays have the shape
+    (number of pairs, n_cells).
+
+    Vout: a 1D array of outflow volumes (one per pair).
+    D: a 1D array of diffusion constants (one per pair).
+    Vin, L, R: inflow volume, length and radius of the colon.
+    n_cells: the number of finite volumes.
+    velocity_factor, coefficient, exponent: the constants of the model
+    (see surrogate_simulator).
+    """
+    Vout = np.asarray(Vout, dtype = np.float64)[:, None]
+    D = np.asarray(D, dtype = np.float64)[:, None]
+    dx = L/n_cells
+
+    # Velocity and dispersion on the cell faces x = dx, 2dx, ..., L.
+    faces = dx*np.arange(1, n_cells + 1)
+    u = velocity_factor*mean_velocity(faces[None, :], Vin, Vout, L, R)
+    K = dispersion(u, D, coefficient, exponent)
+
+    # Coefficients of the tridiagonal matrix A (dc/dt = A c): upper[i] is
+    # A[i, i+1], lower[i] is A[i+1, i].
+    upper = K[:, :-1]/dx**2
+    lower = (u[:, :-1] + K[:, :-1]/dx)/dx
+    diagonal = np.zeros_like(u)
+    diagonal[:, :-1] -= lower
+    diagonal[:, 1:] -= upper
+    # Outflow face at x = L, closed to dispersion: only the flow u c
+    # leaves.
+    diagonal[:, -1] -= u[:, -1]/dx
+
+    # Symmetrise with a diagonal similarity transform S = T^-1 A T,
+    # T = diag(exp(log_scale)).
+    log_scale = np.zeros_like(u)
+    log_scale[:, 1:] = np.cumsum(0.5*np.log(lower/upper), axis = 1)
+    off_diagonal = np.sqrt(upper*lower)
+
+    # Unit pulse in the first cell (c0 = 1/dx, T[0, 0] = 1):
+    # S(t) = dx 1^T T V exp(rates t) V^T T^-1 c0.
+    rates = np.empty_like(u)
+    amplitudes = np.empty_like(u)
+    for i in range(len(u)):
+        rates[i], vectors = tridiagonal_modes(diagonal[i], off_diagonal[i])
+        amplitudes[i] = vectors[0]*(np.exp(log_scale[i]) @ vectors)
+    return rates, amplitudes
+
+
+def survival_density(rates, amplitudes, times, max_elements = MAX_ELEMENTS):
+    """
+    This function evaluates the survival function S(t) and the transit
+    time density f(t) = -dS/dt for every pair at the given times. Two
+    arrays of shape (pairs, times) are returned. The pairs are processed
+    in chunks so that exp(rates*times) has at most max_elements elements.
+
+    rates, amplitudes: the arrays returned by transit_modes.
+    times: a 1D array of times in minutes.
+    max_elements: the size bound of the chunks.
+    """
+    times = np.asarray(times, dtype = np.float64)
+    S = np.empty((len(rates), len(times)))
+    f = np.empty((len(rates), len(times)))
+    step = max(1, max_elements//max(1, rates.shape[1]*len(times)))
+    for start in range(0, len(rates), step):
+        chunk = slice(start, start + step)
+        decay = np.exp(rates[chunk, :, None]*times[None, None, :])
+        S[chunk] = np.einsum("bk,bkt->bt", amplitudes[chunk], decay)
+        f[chunk] = np.einsum("bk,bkt->bt"
+                             , -amplitudes[chunk]*rates[chunk], decay)
+    return np.clip(S, 0., 1.), f
+
+
+def median_time(rates, amplitudes, n_iterations = 60):
+    """
+    This function returns the median transit time (S(t) = 0.5) of every
+    pair by a bisection run on all pairs at once.
+
+    rates, amplitudes: the arrays returned by transit_modes.
+    n_iterations: the number of bisection steps.
+    """
+    low = np.zeros(len(rates))
+    # The survival falls below 0.5 before twice the mean (Markov bound).
+    high = 2*np.sum(amplitudes/-rates, axis = 1)
+    for _ in range(n_iterations):
+        middle = 0.5*(low + high)
+        S = np.sum(amplitudes*np.exp(rates*middle[:, None]), axis = 1)
+        above = S > 0.5
+        low = np.where(above, middle, low)
+        high = np.where(above, high, middle)
+    return 0.5*(low + high)
+
+
+def transit_time_distribution(Vout_list, D_list, times = None, Vin = VIN
+                              , L = L, R = R, n_cells = 200, **kwargs):
+    """
+    This function computes the transit time distribution for every
+    combination of Vout_list and D_list. A dictionary with the entries
+    "Vout", "D" (the pairs, as 1D arrays), "times", "survival" and
+    "density" (arrays of shape (pairs, times)), "mean" and "median" is
+    returned.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    times: optional 1D array of times (minutes). By default 500 points up
+    to four times the largest mean transit time.
+    Vin, L, R: inflow volume, length and radius of the colon.
+    n_cells: the number of finite volumes.
+    kwargs: further arguments of transit_modes (the model constants).
+    """
+    Vout, D = np.meshgrid(np.asarray(Vout_list, dtype = np.float64)
+                          , np.asarray(D_list, dtype = np.float64)
+                          , indexing = "ij")
+    Vout = Vout.ravel()
+    D = D.ravel()
+    rates, amplitudes = transit_modes(Vout, D, Vin, L, R, n_cells
+                                      , **kwargs)
+
+    # Mean transit time = integral of S(t).
+    mean = np.sum(amplitudes/-rates, axis = 1)
+    if times is None:
+        times = np.linspace(0., 4*mean.max(), 500)
+    times = np.asarray(times, dtype = np.float64)
+
+    S, f = survival_density(rates, amplitudes, times)
+    return {"Vout": Vout, "D": D, "times": times, "survival": S
+            , "density": f, "mean": mean
+            , "median": median_time(rates, amplitudes)}
+
+
+def reference_table(Vout_list, D_list, **kwargs):
+    """
+    This function returns the noise-free mean and median transit time of
+    every (Vout, D) pair as a DataFrame with the columns Vout, D, mean and
+    median.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    kwargs: further arguments of transit_time_distribution.
+    """
+    result = transit_time_distribution(Vout_list, D_list
+                                       , times = np.zeros(1), **kwargs)
+    return pd.DataFrame({"Vout": result["Vout"], "D": result["D"]
+                         , "mean": result["mean"]
+                         , "median": result["median"]})
+
+
+def calibrate(start = None, n_cells = 200, **kwargs):
+    """
+    This function fits the constants VELOCITY_FACTOR, DISPERSION and
+    DISPERSION_EXPONENT of surrogate_simulator to NETLOGO_MEAN by least
+    squares on the logarithm of the mean transit times (scipy is needed).
+    The fitted constants and the relative deviations of the means (a
+    DataFrame with the columns Vout, D, netlogo, mean and deviation) are
+    returned.
+
+    start: optional starting values of the three constants (by default
+    the current ones).
+    n_cells: the number of finite volumes.
+    kwargs: further arguments of transit_modes (Vin, L, R).
+    """
+    if least_squares is None:
+        raise ImportError("calibrate needs scipy")
+    if start is None:
+        start = (VELOCITY_FACTOR, DISPERSION, DISPERSION_EXPONENT)
+    cells = [(Vout, D, mean) for Vout, means in NETLOGO_MEAN.items()
+             for D, mean in means.items()]
+    Vout, D, netlogo = (np.array(column, dtype = np.float64)
+                        for column in zip(*cells))
+
+    def means(constants):
+        rates, amplitudes = transit_modes(Vout, D, n_cells = n_cells
+                                          , velocity_factor = constants[0]
+                                          , coefficient = constants[1]
+                                          , exponent = constants[2]
+                                          , **kwargs)
+        return np.sum(amplitudes/-rates, axis = 1)
+
+    fit = least_squares(lambda constants: np.log(means(constants)/netlogo)
+                        , start, x_scale = "jac")
+    mean = means(fit.x)
+    return fit.x, pd.DataFrame({"Vout": Vout, "D": D, "netlogo": netlogo
+                                , "mean": mean
+                                , "deviation": mean/netlogo - 1})
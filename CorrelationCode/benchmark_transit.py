@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark suite for the ingest/reduce/plot path. A synthetic replicate
+# tree is generated for each scale and read_txt, mean_transit_time,
+# transit_time_summary and the plotting functions are timed on it.
+# Every stage is run once as warm-up, then timed over several repeats
+# without memory tracing (tracemalloc slows the calls down several
+# times); the peak memory comes from one more, traced, run.
+#
+# Usage: python benchmark_transit.py [--out results.csv] [--keep DIR]
+#                                    [--repeats N]
+
+import argparse, os, shutil, tempfile, time, tracemalloc, warnings
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+
+import transit_analysis as ta
+from results_table import transit_time_table
+from synthetic_sweep import generate_sweep
+
+
+# Each scale is (number of Vout, number of D, replicates, rows per file).
+DEFAULT_SCALES = [(2, 4, 5, 1000),
+                  (5, 24, 10, 1000),
+                  (5, 24, 10, 10000)]
+
+# Block size of the chunked reading mode.
+CHUNKSIZE = 100000
+
+# Number of timed runs of every stage (after one warm-up run).
+REPEATS = 5
+
+PLOT_FUNCTIONS = [ta.mean_transit_time_boxplot,
+                  ta.mean_transit_time_lineplot,
+                  ta.mean_transit_time_boxplot_sep,
+                  ta.mean_tt_boxplot_sep_min]
+
+
+def sweep_values(n_vout, n_D):
+    """
+    This function returns n_vout Vout values and n_D diffusion constants
+    in the same ranges as the real sweep.
+
+    n_vout: the number of Vout values.
+    n_D: the number of diffusion constants.
+    """
+    Vout_list = [100 + 50*i for i in range(n_vout)]
+    D_list = [round(0.01 + 0.005*i, 4) for i in range(n_D)]
+    return Vout_list, D_list
+
+
+def measure(func, *args, repeats = REPEATS, **kwargs):
+    """
+    This function calls func once as warm-up and then repeats times
+    without memory tracing, and returns the result, the median and the
+    minimal wall time (seconds) of the timed calls. The peak memory
+    (bytes) is measured in one further call under tracemalloc, which is
+    not timed.
+
+    func: the function to measure.
+    args, kwargs: the arguments passed to func.
+    repeats: the number of timed calls.
+    """
+    result = func(*args, **kwargs)
+    wall_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        wall_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, float(np.median(wall_times)), min(wall_times), peak
+
+
+def render(plot_function, mean_tt_dict):
+    """
+    This function calls plot_function, draws the returned figure, so that
+    the rendering time is included in the measurement, and closes it.
+
+    plot_function: one of the plotting functions of transit_analysis.
+    mean_tt_dict: the dictionary generated by function transit_time_summary
+    or the table generated by results_table.transit_time_table.
+    """
+    fig = plot_function(mean_tt_dict)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def benchmark_scale(root, n_vout, n_D, n_replicates, n_rows
+                    , repeats = REPEATS):
+    """
+    This function generates one synthetic sweep under root and times all
+    stages on it. A list with one result dictionary per stage is returned.
+
+    root: an empty folder for the synthetic sweep.
+    n_vout: the number of Vout values.
+    n_D: the number of diffusion constants.
+    n_replicates: the number of replicate files per (Vout, D).
+    n_rows: the number of rows per replicate file.
+    repeats: the number of timed runs of every stage.
+    """
+    Vout_list, D_list = sweep_values(n_vout, n_D)
+    generate_sweep(root, Vout_list, D_list, n_replicates, n_rows)
+
+    cell_files = n_replicates
+    cell_rows = n_replicates*n_rows
+    sweep_files = n_vout*n_D*n_replicates
+    sweep_rows = sweep_files*n_rows
+    scale = {"n_vout": n_vout, "n_D": n_D, "n_replicates": n_replicates
+             , "n_rows": n_rows}
+    results = []
+
+    def record(stage, measurement, files, rows):
+        result, wall_time, min_time, peak = measurement
+        results.append({**scale, "stage": stage, "repeats": repeats
+                        , "wall_time_s": wall_time
+                        , "min_wall_time_s": min_time
+                        , "files": files, "rows": rows
+                        , "files_per_s": files/wall_time
+                        , "rows_per_s": rows/wall_time
+                        , "peak_memory_MB": peak/2**20})
+        return result
+
+    # Single (Vout, D) cell.
+    direction = ta.cell_direction(root, Vout_list[0], D_list[0])
+    cell_data = record("read_txt", measure(ta.read_txt, direction, D_list[0]
+                                           , repeats = repeats)
+                       , cell_files, cell_rows)
+    record("mean_transit_time", measure(ta.mean_transit_time, cell_data
+                                        , repeats = repeats)
+           , cell_files, cell_rows)
+
+    # Whole sweep.
+    all_mean_tt = record("transit_time_summary"
+                         , measure(ta.transit_time_summary, Vout_list
+                                   , D_list, root, repeats = repeats)
+                         , sweep_files, sweep_rows)
+    record("transit_time_summary_chunked"
+           , measure(ta.transit_time_summary, Vout_list, D_list, root
+                     , chunksize = CHUNKSIZE, repeats = repeats)
+           , sweep_files, sweep_rows)
+    table = record("transit_time_table"
+                   , measure(transit_time_table, Vout_list, D_list, root
+                             , repeats = repeats)
+                   , sweep_files, sweep_rows)
+
+    # The plots only see one mean per replicate.
+    for plot_function in PLOT_FUNCTIONS:
+        record(plot_function.__name__
+               , measure(render, plot_function, all_mean_tt
+                         , repeats = repeats)
+               , sweep_files, sweep_files)
+        record(plot_function.__name__ + "_table"
+               , measure(render, plot_function, table, repeats = repeats)
+               , sweep_files, sweep_files)
+
+    return results
+
+
+def run_benchmark(scales = DEFAULT_SCALES, keep = None, repeats = REPEATS):
+    """
+    This function runs benchmark_scale for all given scales and returns
+    the results as a DataFrame with one row per scale and stage.
+
+    scales: a list of (n_vout, n_D, n_replicates, n_rows) tuples.
+    keep: optional folder in which the synthetic sweeps are kept. If None,
+    a temporary folder is used and removed afterwards.
+    repeats: the number of timed runs of every stage.
+    """
+    # Figures are only rendered, never shown.
+    matplotlib.use("Agg")
+    warnings.filterwarnings("ignore", message = ".*non-interactive.*")
+
+    base = keep if keep is not None else tempfile.mkdtemp()
+    results = []
+    try:
+        for i, scale in enumerate(scales):
+            root = os.path.join(base, "scale_" + str(i))
+            results.extend(benchmark_scale(root, *scale, repeats = repeats))
+    finally:
+        if keep is None:
+            shutil.rmtree(base, ignore_errors = True)
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description = "Benchmark the ingest/reduce/plot path.")
+    parser.add_argument("--out", help = "write the results to this CSV file")
+    parser.add_argument("--keep", help = "keep the synthetic sweeps here")
+    parser.add_argument("--repeats", type = int, default = REPEATS
+                        , help = "timed runs of every stage")
+    args = parser.parse_args()
+
+    bench_DF = run_benchmark(keep = args.keep, repeats = args.repeats)
+    pd.set_option("display.width", 200)
+    print(bench_DF.to_string(index = False, float_format = "%.4g"))
+    if args.out:
+        bench_DF.to_csv(args.out, index = False)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checkpoint and resume for long sweep ingests. The statistics of every
+# (Vout, D) cell are written to checkpoint_dir as soon as the cell is
+# finished, so a restarted run only reads the cells that are missing.
+# Files that cannot be read, or that validation.check_file finds
+# incomplete, are quarantined (listed in checkpoint_dir/quarantine.csv)
+# instead of aborting the sweep. Floats are written with 17 significant
+# digits and read back exactly, so a resumed table is bit-identical to a
+# fresh one.
+
+import os
+import pandas as pd
+
+import profiling
+from results_table import STATISTICS, file_statistics, make_table
+from transit_analysis import DATA_ROOT, cell_direction, replicate_files
+from validation import READABLE, check_file
+
+
+QUARANTINE_FILE = "quarantine.csv"
+QUARANTINE_COLUMNS = ["Vout", "D", "file", "error"]
+NO_FILES = "no .txt files found"
+
+# Errors of a single replicate file which do not abort the sweep
+# (unreadable file, parser errors, missing transit time column, missing
+# transit times).
+FILE_ERRORS = (OSError, ValueError, KeyError)
+
+# Enough digits to read every float64 back exactly.
+FLOAT_FORMAT = "%.17g"
+
+
+def cell_checkpoint_path(checkpoint_dir, Vout, D):
+    """
+    This function returns the path of the checkpoint file of one
+    (Vout, D) cell.
+
+    checkpoint_dir: the folder holding the checkpoint files.
+    Vout: the outflow volume.
+    D: the diffusion constant.
+    """
+    return os.path.join(checkpoint_dir
+                        , "Vout=" + str(Vout) + "_Diff=" + str(D) + ".csv")
+
+
+def write_atomic(DF, path):
+    """
+    This function writes a DataFrame to a .csv file in a way that never
+    leaves a half written file behind (write to a temporary file, then
+    rename).
+
+    DF: the DataFrame to write.
+    path: the path of the .csv file.
+    """
+    temp_path = path + ".tmp"
+    DF.to_csv(temp_path, index = False, float_format = FLOAT_FORMAT)
+    os.replace(temp_path, path)
+
+
+def read_checkpoint(path):
+    """
+    This function reads a .csv file written by write_atomic, with every
+    float restored exactly.
+
+    path: the path of the .csv file.
+    """
+    return pd.read_csv(path, float_precision = "round_trip")
+
+
+def load_quarantine(checkpoint_dir):
+    """
+    This function returns the quarantined files of earlier runs as a
+    DataFrame with the columns Vout, D, file and error.
+
+    checkpoint_dir: the folder holding the checkpoint files.
+    """
+    path = os.path.join(checkpoint_dir, QUARANTINE_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns = QUARANTINE_COLUMNS)
+    return read_checkpoint(path)
+
+
+def ingest_cell(Vout, D, root, chunksize = None):
+    """
+    This function reads all replicates of one (Vout, D) cell. Files that
+    check_file does not pass (e.g. a truncated last row) or that cannot
+    be read are skipped. The statistics of the readable files
+    (one row per replicate, including the file name) and a list of
+    quarantine entries are returned.
+
+    Vout: the outflow volume.
+    D: the diffusion constant.
+    root: the folder containing all Vout=... folders.
+    chunksize: if given, the files are read in blocks of chunksize rows.
+    """
+    rows = []
+    quarantine = []
+    direction = cell_direction(root, Vout, D)
+    for i, docu in enumerate(replicate_files(direction)):
+        status, message = check_file(docu)[1:3]
+        if status not in READABLE:
+            quarantine.append({"Vout": Vout, "D": D, "file": docu
+                               , "error": status + ": " + message})
+            continue
+        try:
+            statistics = file_statistics(docu, chunksize)
+        except FILE_ERRORS as error:
+            quarantine.append({"Vout": Vout, "D": D, "file": docu
+                               , "error": type(error).__name__ + ": "
+                               + str(error)})
+            continue
+        rows.append({"Vout": Vout, "D": D, "replicate": i
+                     , "file": os.path.basename(docu), **statistics})
+
+    if not rows and not quarantine:
+        quarantine.append({"Vout": Vout, "D": D, "file": direction
+                           , "error": NO_FILES})
+
+    return pd.DataFrame(rows, columns = ["Vout", "D", "replicate", "file"]
+                        + STATISTICS), quarantine
+
+
+def checkpointed_table(Vout_list, D_list, checkpoint_dir, root = DATA_ROOT
+                       , chunksize = None):
+    """
+    This function builds the long-form table of results_table for a
+    sweep, writing the statistics of every finished (Vout, D) cell to
+    checkpoint_dir. Cells that already have a checkpoint are loaded
+    instead of read again, so an interrupted run continues where it
+    stopped. Unreadable files are reported in the returned quarantine
+    DataFrame (and in checkpoint_dir/quarantine.csv). A cell with
+    quarantined files (or without any .txt files) is reported but not
+    checkpointed, so all its files are read again by the next run, e.g.
+    once a file is repaired or finished. The quarantine entries of a cell
+    that is read again replace its earlier ones.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    checkpoint_dir: the folder holding the checkpoint files.
+    root: the folder containing all Vout=... folders.
+    chunksize: if given, the files are read in blocks of chunksize rows.
+    """
+    os.makedirs(checkpoint_dir, exist_ok = True)
+    # Quarantine entries per cell, {(Vout, D): [entry, ...]}.
+    quarantine = {}
+    for entry in load_quarantine(checkpoint_dir).to_dict(orient = "records"):
+        quarantine.setdefault((entry["Vout"], entry["D"]), []).append(entry)
+    quarantine_path = os.path.join(checkpoint_dir, QUARANTINE_FILE)
+    cell_DFs = []
+
+    for Vout in Vout_list:
+        for D in D_list:
+            path = cell_checkpoint_path(checkpoint_dir, Vout, D)
+            if os.path.exists(path):
+                cell_DFs.append(read_checkpoint(path))
+                continue
+
+            with profiling.cell(Vout = Vout, D = D):
+                cell_DF, cell_quarantine = ingest_cell(Vout, D, root
+                                                       , chunksize)
+            # Quarantine list first, then the checkpoint, so a run that
+            # dies in between reads the cell again. The entries of the
+            # cell replace those of an earlier attempt, so a retried cell
+            # is never listed twice. A cell with quarantined files is not
+            # checkpointed, so the files are tried again on resume.
+            quarantine[(Vout, D)] = cell_quarantine
+            write_atomic(quarantine_frame(quarantine), quarantine_path)
+            if not cell_quarantine:
+                write_atomic(cell_DF, path)
+            cell_DFs.append(cell_DF)
+
+    all_DF = pd.concat(cell_DFs, ignore_index = True)
+    table = make_table(list(all_DF["Vout"]), list(all_DF["D"])
+                       , list(all_DF["replicate"])
+                       , all_DF[STATISTICS].to_dict(orient = "records"))
+    table["file"] = all_DF["file"].to_numpy()
+    return table, quarantine_frame(quarantine)
+
+
+def quarantine_frame(quarantine):
+    """
+    This function turns the quarantine entries per cell into a DataFrame
+    with the columns Vout, D, file and error.
+
+    quarantine: a dictionary {(Vout, D): list of entries}.
+    """
+    return pd.DataFrame([entry for entries in quarantine.values()
+                         for entry in entries], columns = QUARANTINE_COLUMNS)
+
+
+def clear_checkpoints(checkpoint_dir):
+    """
+    This function removes all checkpoint files (and the quarantine list)
+    from checkpoint_dir, so that the next run starts from scratch.
+
+    checkpoint_dir: the folder holding the checkpoint files.
+    """
+    for name in os.listdir(checkpoint_dir):
+        if name.startswith("Vout=") or name == QUARANTINE_FILE:
+            os.remove(os.path.join(checkpoint_dir, name))
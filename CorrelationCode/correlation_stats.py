@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Rank correlation between the diffusion constant and the per-replicate
+# transit time, for every Vout: Spearman's rho, Kendall's tau-b and the
+# Jonckheere-Terpstra trend statistic, with permutation p-values.
+#
+# The permutations are drawn as one matrix per chunk (one permutation per
+# row) and all statistics of a chunk are computed at once. Spearman's rho
+# is a matrix-vector product of the permuted ranks. Kendall's S counts,
+# for the observations in order of transit time, the earlier observations
+# with a smaller and with a larger D; with the D values given as K group
+# labels this is one cumulative count per group, O(n K) per permutation.
+# Jonckheere-Terpstra is JT = (S + pairs with different D)/2, so its
+# permutation p-value is the one of Kendall's tau.
+#
+# Chunks get their own seeds (SeedSequence.spawn), so the p-values are
+# the same for any number of workers.
+#
+# Usage:
+#     table = transit_time_table(Vout_list, D_list, root)
+#     correlation_table(table, n_permutations = 10**5, workers = 4)
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from results_table import table_from_summary
+
+
+ALTERNATIVES = ["two-sided", "less", "greater"]
+
+
+def average_ranks(values):
+    """
+    This function returns the ranks (1, ..., n) of the values; tied
+    values get the average of their ranks.
+
+    values: a 1D array.
+    """
+    _, inverse, counts = np.unique(values, return_inverse = True
+                                   , return_counts = True)
+    # Average rank of every distinct value.
+    ends = np.cumsum(counts)
+    return (ends - (counts - 1)/2.)[inverse]
+
+
+def tie_pairs(values):
+    """
+    This function returns the number of pairs of tied values.
+
+    values: a 1D array.
+    """
+    counts = np.unique(values, return_counts = True)[1]
+    return int(np.sum(counts*(counts - 1)//2))
+
+
+def kendall_S(labels, block_start, K):
+    """
+    This function returns Kendall's S = concordant - discordant pairs for
+    every row of labels. The columns are the observations in order of
+    transit time and labels their D group (0, ..., K-1).
+
+    labels: an integer array of shape (permutations, n).
+    block_start: for every column, the first column with the same transit
+    time (ties in transit time give no pair).
+    K: the number of D groups.
+    """
+    n = labels.shape[1]
+    # Small counts keep the cumulative sums in cache.
+    dtype = np.int16 if n < 2**15 else np.int64
+    labels = labels.astype(dtype)
+    ties = np.any(block_start != np.arange(n))
+
+    S = np.zeros(len(labels), dtype = np.int64)
+    for k in range(K):
+        # Earlier observations (strictly smaller transit time) of group k;
+        # a pair is concordant if the later one has the larger group.
+        in_group = labels == k
+        earlier = np.cumsum(in_group, axis = 1, dtype = dtype)
+        earlier -= in_group
+        if ties:
+            earlier = earlier[:, block_start]
+        S += np.sum(np.sign(labels - dtype(k))*earlier, axis = 1
+                    , dtype = np.int64)
+    return S
+
+
+def prepare(D, transit_time):
+    """
+    This function sorts the observations by transit time and returns the
+    arrays shared by all permutations: centred ranks of D and of the
+    transit time, the D group labels, the tie block starts and the number
+    of D groups.
+
+    D: the diffusion constant of every observation.
+    transit_time: the transit time statistic of every observation.
+    """
+    order = np.argsort(transit_time, kind = "stable")
+    D = np.asarray(D, dtype = np.float64)[order]
+    transit_time = np.asarray(transit_time, dtype = np.float64)[order]
+
+    D_ranks = average_ranks(D)
+    tt_ranks = average_ranks(transit_time)
+    groups, labels = np.unique(D, return_inverse = True)
+
+    new_block = np.concatenate(([True]
+                                , transit_time[1:] != transit_time[:-1]))
+    block_start = np.maximum.accumulate(np.where(new_block
+                                                 , np.arange(len(D)), 0))
+    return (D_ranks - D_ranks.mean(), tt_ranks - tt_ranks.mean()
+            , labels, block_start, len(groups))
+
+
+def statistics(D_ranks, tt_ranks, labels, block_start, K):
+    """
+    This function returns the rank covariance (numerator of Spearman's
+    rho) and Kendall's S for every row of permuted D ranks and labels.
+
+    D_ranks, labels: arrays of shape (permutations, n) (or 1D).
+    tt_ranks, block_start, K: see prepare.
+    """
+    D_ranks = np.atleast_2d(D_ranks)
+    labels = np.atleast_2d(labels)
+    return D_ranks @ tt_ranks, kendall_S(labels, block_start, K)
+
+
+def permutation_chunk(task):
+    """
+    This function draws one chunk of permutations of the D values and
+    returns their statistics. Run by the workers of rank_correlation.
+
+    task: a tuple (seed, n_permutations, D_ranks, tt_ranks, labels,
+    block_start, K).
+    """
+    seed, n_permutations, D_ranks, tt_ranks, labels, block_start, K = task
+    rng = np.random.default_rng(seed)
+    permutations = rng.permuted(np.tile(np.arange(len(labels))
+                                        , (n_permutations, 1)), axis = 1)
+    return statistics(D_ranks[permutations], tt_ranks, labels[permutations]
+                      , block_start, K)
+
+
+def p_value(observed, permuted, alternative):
+    """
+    This function returns the permutation p-value (observed statistic
+    counted as one permutation).
+
+    observed: the observed statistic.
+    permuted: the statistics of the permutations.
+    alternative: "two-sided", "less" or "greater".
+    """
+    # Rank covariances of equal permutations may differ in the last bits.
+    tolerance = 1e-9*max(abs(observed), 1.)
+    if alternative == "less":
+        extreme = permuted <= observed + tolerance
+    elif alternative == "greater":
+        extreme = permuted >= observed - tolerance
+    else:
+        extreme = np.abs(permuted) >= abs(observed) - tolerance
+    return (1. + np.count_nonzero(extreme))/(1. + len(permuted))
+
+
+def chunk_tasks(prepared, n_permutations, chunk_size, seed):
+    """
+    This function splits n_permutations into tasks for permutation_chunk,
+    each with its own child seed.
+    """
+    sizes = [min(chunk_size, n_permutations - start)
+             for start in range(0, n_permutations, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(child, size) + tuple(prepared)
+            for child, size in zip(seeds, sizes)]
+
+
+def summarise(prepared, results, alternative):
+    """
+    This function combines the observed statistics and the permutation
+    results of one Vout into a dictionary (see rank_correlation).
+    """
+    D_ranks, tt_ranks, labels, block_start, K = prepared
+    n = len(labels)
+    covariance, S = statistics(D_ranks, tt_ranks, labels, block_start, K)
+    covariance, S = covariance[0], S[0]
+    permuted_covariance = np.concatenate([r[0] for r in results])
+    permuted_S = np.concatenate([r[1] for r in results])
+
+    pairs = n*(n - 1)//2
+    D_pairs = pairs - tie_pairs(labels)
+    tt_pairs = pairs - tie_pairs(block_start)
+    norm = np.sqrt(np.sum(D_ranks**2)*np.sum(tt_ranks**2))
+    return {"n": n
+            , "spearman": covariance/norm if norm > 0 else np.nan
+            , "p_spearman": p_value(covariance, permuted_covariance
+                                    , alternative)
+            , "kendall": (S/np.sqrt(D_pairs*tt_pairs)
+                          if D_pairs*tt_pairs > 0 else np.nan)
+            , "p_kendall": p_value(S, permuted_S, alternative)
+            , "jt": (S + D_pairs)/2.
+            , "n_permutations": len(permuted_S)}
+
+
+def rank_correlation(D, transit_time, n_permutations = 10**4, seed = 0
+                     , alternative = "two-sided", chunk_size = 2**12
+                     , workers = 1):
+    """
+    This function computes Spearman's rho, Kendall's tau-b and the
+    Jonckheere-Terpstra statistic between D and the transit time, with
+    permutation p-values. A dictionary with the entries n, spearman,
+    p_spearman, kendall, p_kendall, jt (its p-value is p_kendall) and
+    n_permutations is returned.
+
+    D: the diffusion constant of every observation.
+    transit_time: the transit time statistic of every observation.
+    n_permutations: the number of random permutations.
+    seed: the seed of the permutations.
+    alternative: "two-sided", "less" (transit time falls with D) or
+    "greater".
+    chunk_size: the number of permutations computed at once (bounds
+    memory).
+    workers: the number of processes computing the chunks.
+    """
+    return correlation_results({None: (D, transit_time)}, n_permutations
+                               , seed, alternative, chunk_size
+                               , workers)[None]
+
+
+def correlation_results(samples, n_permutations, seed, alternative
+                        , chunk_size, workers):
+    """
+    This function runs the permutation tests of several samples, sharing
+    one process pool. A dictionary {key: result of rank_correlation} is
+    returned.
+
+    samples: a dictionary {key: (D, transit_time)}.
+    n_permutations, seed, alternative, chunk_size, workers: see
+    rank_correlation.
+    """
+    if alternative not in ALTERNATIVES:
+        raise ValueError("alternative has to be one of " + str(ALTERNATIVES))
+
+    prepared = {key: prepare(*sample) for key, sample in samples.items()}
+    tasks = {key: chunk_tasks(prepared[key], n_permutations, chunk_size
+                              , seed)
+             for key in prepared}
+    all_tasks = [task for key in tasks for task in tasks[key]]
+    if workers == 1:
+        all_results = list(map(permutation_chunk, all_tasks))
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            all_results = list(executor.map(permutation_chunk, all_tasks))
+
+    results = {}
+    start = 0
+    for key in tasks:
+        chunk_results = all_results[start:start + len(tasks[key])]
+        start += len(tasks[key])
+        results[key] = summarise(prepared[key], chunk_results, alternative)
+    return results
+
+
+def correlation_table(mean_tt, statistic = "mean", n_permutations = 10**4
+                      , seed = 0, alternative = "two-sided"
+                      , chunk_size = 2**12, workers = 1):
+    """
+    This function tests, for every Vout, the rank correlation between D
+    and the per-replicate transit time (see rank_correlation). A DataFrame
+    with one row per Vout is returned.
+
+    mean_tt: the long-form table generated by
+    results_table.transit_time_table, or the dictionary generated by
+    transit_analysis.transit_time_summary.
+    statistic: the column of the table used ("mean" or "median").
+    n_permutations, seed, alternative, chunk_size, workers: see
+    rank_correlation.
+    """
+    if not isinstance(mean_tt, pd.DataFrame):
+        mean_tt = table_from_summary(mean_tt)
+    samples = {}
+    for Vout, group in mean_tt.groupby("Vout", observed = True, sort = True):
+        group = group[group[statistic].notna()]
+        samples[Vout] = (group["D"].astype(np.float64).to_numpy()
+                         , group[statistic].to_numpy(dtype = np.float64))
+
+    results = correlation_results(samples, n_permutations, seed, alternative
+                                  , chunk_size, workers)
+    result_table = pd.DataFrame.from_dict(results, orient = "index")
+    result_table.index.name = "Vout"
+    return result_table
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Violin and ridge-line plots of the full per-particle transit time
+# distribution of every (Vout, D) cell. The raw turtle_die_tick values are
+# never kept: every replicate is reduced (block by block if needed) to a
+# histogram aggregate on a fixed grid by linear binning. Aggregates of
+# replicates and cells are simply added. The density is then a Gaussian
+# kernel estimate obtained by FFT convolution of the grid counts, so each
+# density costs O(bins log bins) however many particles it holds.
+#
+# The grid is uniform in log10(transit time), which suits the long
+# right tail of the distributions. Transit times outside the grid are not
+# binned (they would pile up at the end points) but counted per cell.
+#
+# Usage:
+#     grid = transit_grid(1, 1e5)
+#     histograms, outside = histogram_table(Vout_list, D_list, grid, root)
+#     violin_plot(histograms, grid)
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from transit_analysis import (DATA_ROOT, cell_direction, read_transit_chunks
+                              , replicate_files)
+
+
+def transit_grid(low, high, n_bins = 1024):
+    """
+    This function returns the grid points (in log10 of the transit time)
+    of the histogram aggregates.
+
+    low: the smallest transit time on the grid (> 0).
+    high: the largest transit time on the grid.
+    n_bins: the number of grid points; a power of 2 keeps the FFT fast.
+    """
+    return np.linspace(np.log10(low), np.log10(high), n_bins)
+
+
+def linear_binning(values, grid):
+    """
+    This function distributes every value onto its two neighbouring grid
+    points, with weights proportional to the distance to the other point
+    (linear binning). Values outside the grid are dropped. The counts on
+    the grid and the number of dropped values are returned; a missing
+    transit time (NaN) raises a ValueError.
+
+    values: an array of transit times.
+    grid: the grid returned by transit_grid.
+    """
+    values = np.asarray(values, dtype = np.float64)
+    if np.isnan(values).any():
+        raise ValueError("missing transit time (NaN) in row "
+                         + str(int(np.argmax(np.isnan(values))) + 1))
+    step = grid[1] - grid[0]
+    with np.errstate(divide = "ignore"):
+        position = (np.log10(values) - grid[0])/step
+    inside = (position >= 0) & (position <= len(grid) - 1)
+    position = position[inside]
+    left = np.minimum(position.astype(np.int64), len(grid) - 2)
+    weight = position - left
+
+    counts = np.bincount(left, weights = 1 - weight, minlength = len(grid))
+    counts += np.bincount(left + 1, weights = weight, minlength = len(grid))
+    return counts, len(values) - len(position)
+
+
+def replicate_histogram(docu, grid, chunksize = 1000000):
+    """
+    This function reads one .txt file block by block and returns the
+    histogram aggregate of its transit times on the grid and the number of
+    transit times outside the grid.
+
+    docu: the path of the .txt file.
+    grid: the grid returned by transit_grid.
+    chunksize: the number of rows read at once.
+    """
+    counts = np.zeros(len(grid))
+    n_outside = 0
+    for chunk in read_transit_chunks(docu, chunksize):
+        chunk_counts, chunk_outside = linear_binning(chunk, grid)
+        counts += chunk_counts
+        n_outside += chunk_outside
+    return counts, n_outside
+
+
+def histogram_table(Vout_list, D_list, grid, root = DATA_ROOT
+                    , chunksize = 1000000):
+    """
+    This function returns the histogram aggregates of all particles of all
+    replicates of every (Vout, D) cell as a dictionary
+    {(Vout, D): counts}, and the numbers of transit times outside the grid
+    as a dictionary {(Vout, D): n_outside}.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    grid: the grid returned by transit_grid.
+    root: the folder containing all Vout=... folders.
+    chunksize: the number of rows read at once.
+    """
+    histograms = {}
+    outside = {}
+    for Vout in Vout_list:
+        for D in D_list:
+            counts = np.zeros(len(grid))
+            n_outside = 0
+            for docu in replicate_files(cell_direction(root, Vout, D)):
+                replicate_counts, replicate_outside = replicate_histogram(
+                    docu, grid, chunksize)
+                counts += replicate_counts
+                n_outside += replicate_outside
+            histograms[(Vout, D)] = counts
+            outside[(Vout, D)] = n_outside
+    return histograms, outside
+
+
+def silverman_bandwidth(counts, grid):
+    """
+    This function returns Silverman's rule of thumb bandwidth (in log10
+    units, like the grid points) computed from the histogram aggregate
+    itself.
+
+    counts: a histogram aggregate.
+    grid: the grid returned by transit_grid.
+    """
+    n = counts.sum()
+    mean = np.sum(counts*grid)/n
+    std = np.sqrt(np.sum(counts*(grid - mean)**2)/n)
+    cumulative = np.cumsum(counts)/n
+    q1, q3 = np.interp([0.25, 0.75], cumulative, grid)
+    spread = min(std, (q3 - q1)/1.34) if q3 > q1 else std
+    return 0.9*spread*n**(-0.2)
+
+
+def binned_kde(counts, grid, bandwidth = None):
+    """
+    This function returns the Gaussian kernel density estimate (density of
+    log10 transit time, integrating to 1) on the grid, computed by FFT
+    convolution of the histogram aggregate with the kernel.
+
+    counts: a histogram aggregate (or a 2D array with one per row).
+    grid: the grid returned by transit_grid.
+    bandwidth: the kernel standard deviation in log10 units. Default:
+    Silverman's rule for every row.
+    """
+    counts = np.atleast_2d(counts)
+    step = grid[1] - grid[0]
+    if bandwidth is None:
+        bandwidth = np.array([silverman_bandwidth(row, grid) if row.sum() > 1
+                              else step for row in counts])
+    bandwidth = np.maximum(np.broadcast_to(bandwidth, len(counts)), step)
+
+    # Zero padding by the kernel reach avoids wrap-around of the FFT.
+    n = len(grid)
+    n_fft = 1 << int(np.ceil(np.log2(2*n)))
+    frequency = np.fft.rfftfreq(n_fft, d = step)
+    # Fourier transform of the Gaussian kernel, one row per bandwidth.
+    kernel = np.exp(-2*(np.pi*frequency[None, :]*bandwidth[:, None])**2)
+
+    smoothed = np.fft.irfft(np.fft.rfft(counts, n_fft, axis = 1)*kernel
+                            , n_fft, axis = 1)[:, :n]
+    smoothed = np.maximum(smoothed, 0.)
+    total = smoothed.sum(axis = 1, keepdims = True)*step
+    return np.divide(smoothed, total, out = np.zeros_like(smoothed)
+                     , where = total > 0)
+
+
+def cell_densities(histograms, grid, bandwidth = None):
+    """
+    This function returns the list of cells and the densities (one row per
+    cell) of a dictionary of histogram aggregates, all in one FFT batch.
+
+    histograms: the dictionary returned by histogram_table.
+    grid: the grid returned by transit_grid.
+    bandwidth: see binned_kde.
+    """
+    cells = list(histograms)
+    counts = np.array([histograms[cell] for cell in cells])
+    return cells, binned_kde(counts, grid, bandwidth)
+
+
+def violin_plot(histograms, grid, bandwidth = None, width = 0.8):
+    """
+    This function draws one row of violins (density of log10 transit time
+    against D) per Vout, with the median of each cell marked.
+
+    histograms: the dictionary returned by histogram_table.
+    grid: the grid returned by transit_grid.
+    bandwidth: see binned_kde.
+    width: the maximal width of a violin (distance of two D values = 1).
+    """
+    cells, densities = cell_densities(histograms, grid, bandwidth)
+    all_Vout = sorted({Vout for Vout, _ in cells})
+    diff_constants = sorted({D for _, D in cells})
+    times = 10**grid
+
+    fig, axs = plt.subplots(len(all_Vout), sharex = True, squeeze = False
+                            , figsize = (10, 2.5*len(all_Vout)))
+    axs = axs[:, 0]
+    fig.suptitle("Distribution of Transit Time and Diffusion Constant")
+
+    for (Vout, D), current_density in zip(cells, densities):
+        ax = axs[all_Vout.index(Vout)]
+        x = diff_constants.index(D) + 1
+        half_width = 0.5*width*current_density/max(current_density.max()
+                                                   , 1e-300)
+        ax.fill_betweenx(times, x - half_width, x + half_width
+                         , color = "C0", alpha = 0.6, lw = 0)
+        cumulative = np.cumsum(histograms[(Vout, D)])
+        if cumulative[-1] > 0:
+            median = 10**np.interp(0.5*cumulative[-1], cumulative, grid)
+            ax.plot([x - 0.5*width, x + 0.5*width], [median, median]
+                    , c = "C1")
+
+    for ax, Vout in zip(axs, all_Vout):
+        ax.set_yscale("log", base = 10)
+        ax.set_title("Vout=" + str(Vout))
+    axs[-1].set_xticks(list(range(1, len(diff_constants)+1)))
+    axs[-1].set_xticklabels(diff_constants)
+
+    fig.text(0.5, 0.04, "Diffusion Constants ($cm^2/min$)", ha = "center")
+    fig.text(0.04, 0.5, "Transit Time ($min$)", va = "center"
+             , rotation = "vertical")
+    plt.show()
+
+    return fig
+
+
+def ridgeline_plot(histograms, grid, Vout, bandwidth = None, overlap = 2.):
+    """
+    This function draws the densities of all D values of one Vout as
+    stacked, overlapping curves (ridge lines) over log10 transit time.
+
+    histograms: the dictionary returned by histogram_table.
+    grid: the grid returned by transit_grid.
+    Vout: the Vout value shown.
+    bandwidth: see binned_kde.
+    overlap: the height of the highest curve in units of the row distance.
+    """
+    selected = {cell: counts for cell, counts in histograms.items()
+                if cell[0] == Vout}
+    cells, densities = cell_densities(selected, grid, bandwidth)
+    order = np.argsort([D for _, D in cells])
+    scale = overlap/densities.max()
+    times = 10**grid
+
+    fig, ax = plt.subplots(figsize = (8, 0.4*len(cells) + 2))
+    for row, i in enumerate(order):
+        # Lower rows are drawn later so they cover the rows behind.
+        baseline = len(cells) - 1 - row
+        zorder = row + 1
+        ax.fill_between(times, baseline, baseline + scale*densities[i]
+                        , color = "C0", alpha = 0.7, lw = 0
+                        , zorder = zorder)
+        ax.plot(times, baseline + scale*densities[i], c = "k", lw = 0.6
+                , zorder = zorder)
+
+    ax.set_xscale("log", base = 10)
+    ax.set_yticks([len(cells) - 1 - row for row in range(len(cells))])
+    ax.set_yticklabels([cells[i][1] for i in order])
+    ax.set_xlabel("Transit Time ($min$)")
+    ax.set_ylabel("Diffusion Constants ($cm^2/min$)")
+    ax.set_title("Distribution of Transit Time, Vout=" + str(Vout))
+    fig.tight_layout()
+    plt.show()
+
+    return fig
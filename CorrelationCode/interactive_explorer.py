@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Interactive explorer of a sweep (long-form table of results_table.py)
+# for the %matplotlib widget backend. Controls select the shown Vout
+# values, the D range, the statistic (replicate means or medians) and a
+# log or linear y axis.
+#
+# The box statistics of every (Vout, D) cell are computed once for both
+# statistics. Every Vout is drawn with only two artists (the line through
+# the medians and one path holding all boxes and whiskers), which are
+# updated in place with set_data. Changes that keep the axis limits are
+# blitted; only changes of the limits or the scale redraw the figure.
+#
+# Usage:
+#     %matplotlib widget
+#     explorer = TransitExplorer(table)
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.widgets import CheckButtons, RadioButtons, RangeSlider
+
+
+STATISTIC_CHOICES = ["mean", "median"]
+
+
+def box_statistics(table, statistic):
+    """
+    This function computes the boxplot statistics of the given column for
+    every (Vout, D) cell in one vectorised pass. A dictionary with the
+    arrays "q1", "median", "q3", "low", "high" (whisker ends, 1.5 IQR rule)
+    and "mean", each of shape (number of Vout, number of D), is returned.
+    Missing cells are NaN.
+
+    table: the table generated by results_table.transit_time_table.
+    statistic: the column used ("mean" or "median").
+    """
+    keys = ["Vout", "D"]
+    grouped = table.groupby(keys, observed = False, sort = True)[statistic]
+    q1 = grouped.transform("quantile", 0.25)
+    q3 = grouped.transform("quantile", 0.75)
+    iqr = q3 - q1
+    values = table[statistic]
+    inside_low = values.where(values >= q1 - 1.5*iqr)
+    inside_high = values.where(values <= q3 + 1.5*iqr)
+
+    cells = {"q1": grouped.quantile(0.25), "median": grouped.median()
+             , "q3": grouped.quantile(0.75), "mean": grouped.mean()
+             , "low": inside_low.groupby([table[k] for k in keys]
+                                         , observed = False).min()
+             , "high": inside_high.groupby([table[k] for k in keys]
+                                           , observed = False).max()}
+    return {name: series.unstack("D").to_numpy(dtype = np.float64)
+            for name, series in cells.items()}
+
+
+def box_path(D, stats, row, width):
+    """
+    This function returns the x and y values of one path drawing all boxes,
+    median marks and whiskers of one Vout. The single boxes are separated
+    by NaN, so the path can be drawn by one Line2D.
+
+    D: the array of diffusion constants.
+    stats: the dictionary returned by box_statistics.
+    row: the row (Vout) of the statistics.
+    width: the width of a box in decades of D.
+    """
+    left = D*10**(-width/2)
+    right = D*10**(width/2)
+    nan = np.full_like(D, np.nan)
+    q1, median, q3 = stats["q1"][row], stats["median"][row], stats["q3"][row]
+    low, high = stats["low"][row], stats["high"][row]
+
+    X = np.stack((left, right, right, left, left, nan
+                  , left, right, nan
+                  , D, D, nan, D, D, nan), axis = 1)
+    Y = np.stack((q1, q1, q3, q3, q1, nan
+                  , median, median, nan
+                  , low, q1, nan, q3, high, nan), axis = 1)
+    return X.ravel(), Y.ravel()
+
+
+class TransitExplorer:
+    """
+    Interactive figure showing, for every Vout, boxplots of the replicate
+    statistic over D with a line through the medians.
+
+    table: the table generated by results_table.transit_time_table.
+    box_width: the width of a box in decades of D.
+    """
+    def __init__(self, table, box_width = None):
+        self.Vout = np.asarray(table["Vout"].cat.categories)
+        self.D = np.asarray(table["D"].cat.categories, dtype = np.float64)
+        if box_width is None:
+            # Boxes of neighbouring D values should not overlap.
+            decades = np.diff(np.log10(self.D))
+            box_width = 0.6*decades.min() if len(decades) else 0.1
+        self.box_width = box_width
+
+        # Cached aggregates; nothing is recomputed by the controls.
+        self.cache = {statistic: box_statistics(table, statistic)
+                      for statistic in STATISTIC_CHOICES
+                      if statistic in table and table[statistic].notna().any()}
+        self.statistic = next(iter(self.cache))
+
+        self.fig = plt.figure(figsize = (11, 6))
+        self.ax = self.fig.add_axes([0.08, 0.1, 0.65, 0.82])
+        self.ax.set_xscale("log", base = 10)
+        self.ax.set_yscale("log", base = 10)
+        self.ax.set_xlabel("Diffusion Constants ($cm^2/min$)")
+        self.ax.set_ylabel("Transit Time ($min$)")
+        self.ax.set_title(
+            "Correlation between Transit Time and Diffusion Constant")
+
+        self.lines = []
+        self.boxes = []
+        for row, Vout in enumerate(self.Vout):
+            line, = self.ax.plot([], [], "-", label = "Vout=" + str(Vout)
+                                 , animated = True)
+            boxes, = self.ax.plot([], [], "-", lw = 0.8
+                                  , color = line.get_color(), animated = True)
+            self.lines.append(line)
+            self.boxes.append(boxes)
+        self.ax.legend(handles = self.lines, loc = "upper right"
+                       , fontsize = "small")
+        self.update_artists()
+
+        self.add_controls()
+        self.background = None
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        self.rescale()
+
+    def add_controls(self):
+        """
+        This function adds the check buttons (Vout), the range slider
+        (log10 D) and the radio buttons (statistic, y scale).
+        """
+        labels = ["Vout=" + str(Vout) for Vout in self.Vout]
+        height = min(0.4, 0.03*len(labels) + 0.02)
+        ax_vout = self.fig.add_axes([0.76, 0.92 - height, 0.2, height])
+        self.vout_buttons = CheckButtons(ax_vout, labels
+                                         , [True]*len(labels))
+        self.vout_buttons.on_clicked(self.on_vout)
+
+        ax_statistic = self.fig.add_axes([0.76, 0.38, 0.2, 0.1])
+        self.statistic_buttons = RadioButtons(ax_statistic
+                                              , list(self.cache))
+        self.statistic_buttons.on_clicked(self.on_statistic)
+
+        ax_scale = self.fig.add_axes([0.76, 0.25, 0.2, 0.1])
+        self.scale_buttons = RadioButtons(ax_scale, ["log", "linear"])
+        self.scale_buttons.on_clicked(self.on_scale)
+
+        log_D = np.log10(self.D)
+        ax_range = self.fig.add_axes([0.78, 0.12, 0.16, 0.04])
+        self.range_slider = RangeSlider(ax_range, "log10 D", log_D.min()
+                                        , log_D.max() + 1e-9
+                                        , valinit = (log_D.min()
+                                                     , log_D.max() + 1e-9)
+                                        , valfmt = "%.1f")
+        self.range_slider.on_changed(self.on_range)
+
+    def update_artists(self):
+        """
+        This function sets the data of all lines and box paths from the
+        cache of the current statistic.
+        """
+        stats = self.cache[self.statistic]
+        for row in range(len(self.Vout)):
+            self.lines[row].set_data(self.D, stats["median"][row])
+            self.boxes[row].set_data(*box_path(self.D, stats, row
+                                               , self.box_width))
+
+    def visible_rows(self):
+        return [row for row, line in enumerate(self.lines)
+                if line.get_visible()]
+
+    def rescale(self):
+        """
+        This function sets the axis limits to the visible Vout values and
+        the selected D range, and redraws the figure.
+        """
+        low_D, high_D = 10.**np.asarray(self.range_slider.val, dtype = float)
+        margin = 10**self.box_width
+        self.ax.set_xlim(low_D/margin, high_D*margin)
+
+        stats = self.cache[self.statistic]
+        rows = self.visible_rows()
+        columns = (self.D >= low_D) & (self.D <= high_D)
+        if rows and columns.any():
+            low = np.nanmin(stats["low"][rows][:, columns])
+            high = np.nanmax(stats["high"][rows][:, columns])
+            if np.isfinite(low) and np.isfinite(high):
+                if self.ax.get_yscale() == "log":
+                    self.ax.set_ylim(low/1.1, high*1.1)
+                else:
+                    pad = 0.05*(high - low) + 1e-12
+                    self.ax.set_ylim(low - pad, high + pad)
+        self.fig.canvas.draw_idle()
+
+    def on_draw(self, event):
+        # A full draw leaves out the animated artists: keep the background
+        # for blitting and draw them on top.
+        canvas = self.fig.canvas
+        if getattr(canvas, "supports_blit", False):
+            self.background = canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for row in self.visible_rows():
+            self.ax.draw_artist(self.boxes[row])
+            self.ax.draw_artist(self.lines[row])
+
+    def blit(self):
+        """
+        This function redraws only the line and box artists on top of the
+        stored background; without blitting support it falls back to a
+        redraw.
+        """
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        self.draw_animated()
+        canvas.blit(self.ax.bbox)
+
+    def on_vout(self, label):
+        row = ["Vout=" + str(Vout) for Vout in self.Vout].index(label)
+        visible = not self.lines[row].get_visible()
+        self.lines[row].set_visible(visible)
+        self.boxes[row].set_visible(visible)
+        self.blit()
+
+    def on_statistic(self, label):
+        self.statistic = label
+        self.update_artists()
+        self.rescale()
+
+    def on_scale(self, label):
+        self.ax.set_yscale(label)
+        self.rescale()
+
+    def on_range(self, value):
+        self.rescale()
+
+
+def explore(table, **kwargs):
+    """
+    This function opens a TransitExplorer for the given table and returns
+    it (keep a reference, otherwise the controls stop working).
+
+    table: the table generated by results_table.transit_time_table.
+    kwargs: further arguments of TransitExplorer.
+    """
+    explorer = TransitExplorer(table, **kwargs)
+    plt.show()
+    return explorer
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Stage-level timing instrumentation for the sweep analysis. The
+# functions in transit_analysis.py mark their stages (directory listing,
+# CSV parsing, reduction, DataFrame construction, plotting) with
+# profiling.stage(...). Recording is off by default; while it is off,
+# stage() returns a shared do-nothing object.
+#
+# Usage:
+#     profiling.enable(memory = True)
+#     all_mean_tt = transit_time_summary(Vout_list, D_list)
+#     profiling.disable()
+#     profiling.write_report("profile.csv")
+
+import cProfile, functools, json, os, pstats, time, tracemalloc
+import pandas as pd
+
+
+class _NullStage:
+    """
+    Stand-in for Stage while recording is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, rows = 0, nbytes = 0):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """
+    One timed stage. Rows and bytes are added with add(); wall time and
+    peak memory are recorded when the stage is left.
+
+    name: the name of the stage, e.g. "parse_csv".
+    labels: a dictionary of labels, e.g. {"Vout": 100, "D": 0.01}.
+    """
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.rows = 0
+        self.nbytes = 0
+        self.peak = 0
+        self.profiler = None
+
+    def add(self, rows = 0, nbytes = 0):
+        self.rows += rows
+        self.nbytes += nbytes
+
+    def __enter__(self):
+        if _state["memory"]:
+            # Keep the peak of the enclosing stage before resetting it.
+            if _state["stack"]:
+                parent = _state["stack"][-1]
+                parent.peak = max(parent.peak
+                                  , tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.name == _state["profile_stage"]:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        _state["stack"].append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall_time = time.perf_counter() - self.start
+        _state["stack"].pop()
+        if self.profiler is not None:
+            self.profiler.disable()
+            _state["profiles"].append(self.profiler)
+        if _state["memory"]:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if _state["stack"]:
+                parent = _state["stack"][-1]
+                parent.peak = max(parent.peak, self.peak)
+
+        _state["records"].append({"stage": self.name, **self.labels
+                                  , "wall_time_s": wall_time
+                                  , "rows": self.rows
+                                  , "bytes_read": self.nbytes
+                                  , "peak_memory_MB": self.peak/2**20})
+        return False
+
+
+_state = {"enabled": False, "memory": False, "profile_stage": None
+          , "labels": {}, "stack": [], "records": [], "profiles": []}
+
+
+def enable(memory = False, profile_stage = None):
+    """
+    This function switches the recording on and clears earlier records.
+
+    memory: if True, the peak memory of every stage is traced with
+    tracemalloc (this slows the analysis down noticeably).
+    profile_stage: optional name of one stage (e.g. "parse_csv") that is
+    additionally run under cProfile. See profile_stats().
+    """
+    _state.update(enabled = True, memory = memory
+                  , profile_stage = profile_stage
+                  , stack = [], records = [], profiles = [])
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """
+    This function switches the recording off. The records are kept until
+    the next enable().
+    """
+    if _state["memory"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state.update(enabled = False, memory = False)
+
+
+def is_enabled():
+    """
+    This function returns True while the recording is switched on.
+    """
+    return _state["enabled"]
+
+
+def stage(name):
+    """
+    This function returns a context manager timing the stage name. The
+    labels set by cell() are attached to the record.
+
+    name: the name of the stage.
+    """
+    if not _state["enabled"]:
+        return _NULL_STAGE
+    return Stage(name, dict(_state["labels"]))
+
+
+def timed(func):
+    """
+    Decorator recording every call of func as a stage named after func.
+
+    func: the function to time.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class cell:
+    """
+    Context manager attaching labels (e.g. Vout and D) to all stages
+    recorded inside it.
+
+    labels: the labels as keyword arguments.
+    """
+    def __init__(self, **labels):
+        self.labels = labels
+
+    def __enter__(self):
+        self.previous = _state["labels"]
+        _state["labels"] = {**self.previous, **self.labels}
+        return self
+
+    def __exit__(self, *exc):
+        _state["labels"] = self.previous
+        return False
+
+
+def report():
+    """
+    This function returns all records as a DataFrame with one row per
+    recorded stage.
+    """
+    return pd.DataFrame(_state["records"])
+
+
+def summary():
+    """
+    This function returns the records aggregated per stage: number of
+    calls, total wall time, rows, bytes read, maximal peak memory and
+    the resulting throughput.
+    """
+    report_DF = report()
+    if report_DF.empty:
+        return report_DF
+    summary_DF = report_DF.groupby("stage", sort = False).agg(
+        calls = ("wall_time_s", "size"), wall_time_s = ("wall_time_s", "sum")
+        , rows = ("rows", "sum"), bytes_read = ("bytes_read", "sum")
+        , peak_memory_MB = ("peak_memory_MB", "max"))
+    summary_DF["rows_per_s"] = summary_DF["rows"]/summary_DF["wall_time_s"]
+    return summary_DF
+
+
+def write_report(path):
+    """
+    This function writes all records to a .json or .csv file, depending
+    on the file extension.
+
+    path: the path of the report file.
+    """
+    report_DF = report()
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, "w") as f:
+            json.dump(report_DF.to_dict(orient = "records"), f, indent = 1
+                      , default = str)
+    else:
+        report_DF.to_csv(path, index = False)
+
+
+def profile_stats(sort = "cumulative"):
+    """
+    This function returns the merged cProfile statistics of the stage
+    given as profile_stage to enable(), or None if nothing was profiled.
+
+    sort: the key used to sort the statistics.
+    """
+    if not _state["profiles"]:
+        return None
+    stats = pstats.Stats(_state["profiles"][0])
+    for profiler in _state["profiles"][1:]:
+        stats.add(profiler)
+    return stats.sort_stats(sort)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Long-form (tidy) results table of a sweep: one row per replicate with
+# the columns Vout, D, replicate, n, sum, mean, median, std, min and max.
+# Vout and D are ordered categoricals, so grouping and pivoting work on
+# integer codes. The plotting functions of transit_analysis.py accept the
+# table directly.
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import profiling
+from transit_analysis import (DATA_ROOT, cell_direction, fixed_blocks
+                              , parse_folder, replicate_files, read_replicate
+                              , read_transit_chunks)
+
+
+STATISTICS = ["n", "sum", "mean", "median", "std", "min", "max"]
+
+
+def replicate_statistics(chunks, median = True):
+    """
+    This function reduces the transit times of one replicate, given as
+    one or more blocks, to the statistics in STATISTICS. Sums are taken
+    over fixed blocks of rows and merged with math.fsum, so the result is
+    bit-identical whatever the block size of the reading. The variance
+    uses the sums of the values shifted by the first value. A missing
+    (NaN) or non-numeric transit time raises a ValueError.
+
+    chunks: an iterable of numpy arrays.
+    median: if False, the median is not computed (NaN); used for blocked
+    reading where the whole column is never in memory.
+    """
+    n = 0
+    shift = None
+    partials = []
+    shifted = []
+    squares = []
+    minimum = np.inf
+    maximum = -np.inf
+    values = []
+
+    for block in fixed_blocks(chunks):
+        block = np.asarray(block, dtype = np.float64)
+        # A NaN (e.g. a truncated last row) would make the sum NaN and be
+        # skipped by min and max.
+        if np.isnan(block).any():
+            raise ValueError("missing transit time (NaN) in row "
+                             + str(n + int(np.argmax(np.isnan(block))) + 1))
+        if shift is None:
+            shift = float(block[0])
+        deviation = block - shift
+        n += len(block)
+        partials.append(np.sum(block, dtype = np.float64))
+        shifted.append(np.sum(deviation, dtype = np.float64))
+        squares.append(np.sum(deviation**2, dtype = np.float64))
+        minimum = min(minimum, np.min(block))
+        maximum = max(maximum, np.max(block))
+        if median:
+            values.append(block)
+
+    if n == 0:
+        return {"n": 0, "sum": 0., "mean": np.nan, "median": np.nan
+                , "std": np.nan, "min": np.nan, "max": np.nan}
+
+    total = math.fsum(partials)
+    M2 = max(math.fsum(squares) - math.fsum(shifted)**2/n, 0.)
+    return {"n": n, "sum": total, "mean": total/n
+            , "median": np.median(np.concatenate(values)) if median else np.nan
+            , "std": np.sqrt(M2/(n-1)) if n > 1 else np.nan
+            , "min": float(minimum), "max": float(maximum)}
+
+
+def file_statistics(docu, chunksize = None):
+    """
+    This function reads one .txt file (replicate) and returns its
+    statistics (see replicate_statistics).
+
+    docu: the path of the .txt file.
+    chunksize: if given, the file is read in blocks of chunksize rows and
+    the median is not computed.
+    """
+    if chunksize is None:
+        chunks = [read_replicate(docu)]
+    else:
+        chunks = read_transit_chunks(docu, chunksize)
+    with profiling.stage("reduce"):
+        return replicate_statistics(chunks, median = chunksize is None)
+
+
+def ordered_categorical(values):
+    """
+    This function returns values as an ordered categorical. The values
+    keep their types: mixed int and float values (e.g. from the folders
+    Vout=100 and Vout=200.5) get object categories, so 100 is not turned
+    into 100.0 in labels and keys.
+
+    values: the values of every row.
+    """
+    categories = sorted(set(values))
+    if len({type(value) for value in categories}) > 1:
+        categories = pd.Index(categories, dtype = object)
+    return pd.Categorical(values, categories = categories, ordered = True)
+
+
+def make_table(Vout_values, D_values, replicates, statistics):
+    """
+    This function assembles the columns of the long-form table. Vout and
+    D become ordered categoricals (see ordered_categorical).
+
+    Vout_values: the Vout of every row.
+    D_values: the diffusion constant of every row.
+    replicates: the replicate number of every row.
+    statistics: a list of dictionaries (one per row) as returned by
+    replicate_statistics.
+    """
+    with profiling.stage("dataframe"):
+        table = pd.DataFrame({
+            "Vout": ordered_categorical(Vout_values),
+            "D": ordered_categorical(D_values),
+            "replicate": np.asarray(replicates, dtype = np.int64)})
+        for name in STATISTICS:
+            values = [s[name] for s in statistics]
+            if name != "n":
+                table[name] = np.array(values, dtype = np.float64)
+            elif pd.isna(values).any():
+                # Unknown particle counts (tables built from means only).
+                table[name] = pd.array(values, dtype = "Int64")
+            else:
+                table[name] = np.array(values, dtype = np.int64)
+    return table
+
+
+def transit_time_table(Vout_list, D_list, root = DATA_ROOT
+                       , chunksize = None, workers = 1):
+    """
+    This function reads all replicates of a sweep and returns the
+    long-form table with one row per (Vout, D, replicate). Every file is
+    reduced on its own and the rows are put in the canonical file order,
+    so the table is bit-identical for any number of workers.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    root: the folder containing all Vout=... folders.
+    chunksize: if given, the files are read in blocks of chunksize rows.
+    The median is then not available (NaN).
+    workers: the number of processes reading the files.
+    """
+    Vout_values = []
+    D_values = []
+    replicates = []
+    files = []
+
+    for Vout in Vout_list:
+        for D in D_list:
+            with profiling.cell(Vout = Vout, D = D):
+                direction = cell_direction(root, Vout, D)
+                for i, docu in enumerate(replicate_files(direction)):
+                    files.append(docu)
+                    Vout_values.append(Vout)
+                    D_values.append(D)
+                    replicates.append(i)
+
+    if workers == 1:
+        statistics = []
+        for Vout, D, docu in zip(Vout_values, D_values, files):
+            with profiling.cell(Vout = Vout, D = D):
+                statistics.append(file_statistics(docu, chunksize))
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            statistics = list(executor.map(file_statistics, files
+                                           , [chunksize]*len(files)))
+
+    return make_table(Vout_values, D_values, replicates, statistics)
+
+
+def table_from_summary(mean_tt_dict):
+    """
+    This function turns the nested dictionary of transit_time_summary
+    into the long-form table. Only the column "mean" is filled; the
+    particle counts n are unknown (<NA>), so pooled_mean gives NaN.
+
+    mean_tt_dict: the dictionary generated by function transit_time_summary.
+    """
+    Vout_values = []
+    D_values = []
+    replicates = []
+    statistics = []
+    for key, mean_tt in mean_tt_dict.items():
+        Vout = parse_folder(key, "Vout=")
+        if Vout is None:
+            raise ValueError("not a Vout key: " + repr(key))
+        for D, means in mean_tt.items():
+            for i, mean in enumerate(means):
+                Vout_values.append(Vout)
+                D_values.append(D)
+                replicates.append(i)
+                statistics.append({**dict.fromkeys(STATISTICS, np.nan)
+                                   , "mean": mean})
+    return make_table(Vout_values, D_values, replicates, statistics)
+
+
+def table_to_summary(table, statistic = "mean"):
+    """
+    This function turns the long-form table back into the nested
+    dictionary of transit_time_summary.
+
+    table: the table generated by transit_time_table.
+    statistic: the column used as value.
+    """
+    mean_tt_dict = {}
+    for (Vout, D), values in table.groupby(["Vout", "D"], observed = True
+                                           , sort = True)[statistic]:
+        key = "Vout=" + str(Vout)
+        mean_tt_dict.setdefault(key, {})[D] = list(values)
+    return mean_tt_dict
+
+
+def cell_summary(table, statistic = "mean"):
+    """
+    This function aggregates one column of the table over the replicates
+    of every (Vout, D) cell: count, mean, median, std, min and max.
+
+    table: the table generated by transit_time_table.
+    statistic: the aggregated column.
+    """
+    return (table.groupby(["Vout", "D"], observed = True, sort = True)
+            [statistic].agg(["count", "mean", "median", "std", "min", "max"]))
+
+
+def pooled_mean(table):
+    """
+    This function returns the mean transit time of every (Vout, D) cell
+    over all particles of all replicates (weighted by n), as a Series.
+    Cells with unknown particle counts give NaN.
+
+    table: the table generated by transit_time_table.
+    """
+    grouped = table.groupby(["Vout", "D"], observed = True, sort = True)
+    sums = grouped[["sum", "n"]].sum(min_count = 1)
+    return ((sums["sum"]/sums["n"]).astype(np.float64)
+            .rename("pooled_mean"))
+
+
+def optimal_D(table, statistic = "mean"):
+    """
+    This function returns, for every Vout, the diffusion constant with the
+    minimal median (over the replicates) of the given column and that
+    minimal value, as a DataFrame.
+
+    table: the table generated by transit_time_table.
+    statistic: the column used.
+    """
+    medians = cell_summary(table, statistic)["median"].unstack("D")
+    return pd.DataFrame({"min_D": medians.idxmin(axis = 1)
+                         , "min_median": medians.min(axis = 1)})
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Global (variance based) sensitivity analysis of τ_median and
+# τ_taylor_expension over Vin, Vout, L and R. Two sample matrices A and B
+# are drawn from a quasi-random Sobol sequence (scipy.stats.qmc, if
+# installed) or from a Latin hypercube, and the first-order and total
+# Sobol indices are estimated with the Saltelli (2010) and Jansen (1999)
+# estimators.
+#
+# The samples are processed in chunks: every chunk only contributes a few
+# sums, so 10^7 and more samples run in bounded memory, and the chunks can
+# be evaluated on a process pool.
+#
+# Usage:
+#     indices = sobol_indices(n_samples = 2**20)
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from transit_theory import τ_median, τ_taylor_expension
+
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+
+
+# Physiological ranges (uniform) of the parameters: inflow and outflow
+# volume in ml/day, length and radius of the proximal colon in cm.
+PARAMETER_RANGES = {"Vin": (1000., 2000.),
+                    "Vout": (50., 400.),
+                    "L": (20., 40.),
+                    "R": (2., 3.5)}
+
+OUTPUTS = ["τ_median", "τ_taylor"]
+
+
+def evaluate(samples, ord_n = 10):
+    """
+    This function evaluates τ_median and τ_taylor_expension for all rows
+    of samples (columns Vin, Vout, L, R) and returns an array of shape
+    (rows, 2).
+
+    samples: an array with one parameter set per row.
+    ord_n: the order of the taylor expension.
+    """
+    Vin, Vout, L, R = samples.T
+    return np.column_stack((τ_median(Vin, Vout, L, R)
+                            , τ_taylor_expension(ord_n, Vout, Vin, L, R)))
+
+
+def unit_samples(start, n, dimension, method, seed):
+    """
+    This function returns the rows start, ..., start + n - 1 of a
+    quasi-random sample in the unit cube. A Sobol sequence is skipped
+    forward to start, so the chunks of a run together are one Sobol
+    sequence. A Latin hypercube is drawn per chunk with its own seed.
+
+    start: the index of the first row.
+    n: the number of rows.
+    dimension: the number of columns.
+    method: "sobol" or "lhs".
+    seed: the seed of the sample.
+    """
+    if method == "sobol":
+        sampler = qmc.Sobol(dimension, scramble = True, seed = seed)
+        if start:
+            sampler.fast_forward(start)
+        return sampler.random(n)
+
+    # Latin hypercube: one random point in each of n strata per column.
+    rng = np.random.default_rng([seed, start])
+    strata = np.argsort(rng.random((dimension, n)), axis = 1).T
+    return (strata + rng.random((n, dimension)))/n
+
+
+def chunk_sums(task):
+    """
+    This function evaluates one chunk of the Saltelli design and returns
+    the sums the estimators need. Run by the workers of sobol_indices.
+
+    task: a tuple (start, n, method, seed, ord_n, low, width, shift).
+    """
+    start, n, method, seed, ord_n, low, width, shift = task
+    k = len(low)
+    unit = unit_samples(start, n, 2*k, method, seed)
+    A = low + width*unit[:, :k]
+    B = low + width*unit[:, k:]
+
+    # Shifted outputs keep the sums of squares well conditioned.
+    f_A = evaluate(A, ord_n) - shift
+    f_B = evaluate(B, ord_n) - shift
+
+    first = np.zeros((k, f_A.shape[1]))
+    total = np.zeros((k, f_A.shape[1]))
+    for i in range(k):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        f_AB = evaluate(AB, ord_n) - shift
+        first[i] = np.sum(f_B*(f_AB - f_A), axis = 0)
+        total[i] = np.sum((f_A - f_AB)**2, axis = 0)
+
+    both = np.concatenate((f_A, f_B))
+    return {"n": n, "sum": both.sum(axis = 0)
+            , "sum_sq": (both**2).sum(axis = 0)
+            , "first": first, "total": total}
+
+
+def merge_sums(results):
+    """
+    This function merges the sums of the chunks in chunk order and returns
+    the number of samples and the merged sums.
+
+    results: an iterable of the dictionaries returned by chunk_sums.
+    """
+    n = 0
+    sums = None
+    for result in results:
+        n += result["n"]
+        if sums is None:
+            sums = {key: result[key] for key in ["sum", "sum_sq", "first"
+                                                 , "total"]}
+        else:
+            for key in sums:
+                sums[key] = sums[key] + result[key]
+    return n, sums
+
+
+def sobol_indices(n_samples = 2**16, ranges = PARAMETER_RANGES
+                  , chunk_size = 2**14, method = None, seed = 0, ord_n = 10
+                  , workers = 1):
+    """
+    This function estimates the first-order (S1) and total (ST) Sobol
+    indices of τ_median and τ_taylor_expension with respect to the
+    parameters in ranges. The cost is n_samples*(number of parameters + 2)
+    evaluations, done in chunks of chunk_size samples. A DataFrame with
+    one row per parameter and the columns (output, "S1"/"ST") is returned.
+
+    n_samples: the number of rows of the matrices A and B. For Sobol
+    sequences a power of 2 is best.
+    ranges: a dictionary with the (low, high) range of Vin, Vout, L and R.
+    chunk_size: the number of samples evaluated at once (bounds memory).
+    For Sobol sequences a power of 2 is best.
+    method: "sobol" or "lhs". Default: "sobol" if scipy is installed.
+    seed: the seed of the sample.
+    ord_n: the order of the taylor expension.
+    workers: the number of processes evaluating the chunks.
+    """
+    if method is None:
+        method = "sobol" if qmc is not None else "lhs"
+    if method == "sobol" and qmc is None:
+        raise ImportError("method 'sobol' needs scipy; use method = 'lhs'")
+    if ranges["Vout"][1] >= ranges["Vin"][0]:
+        raise ValueError("the Vout range has to lie below the Vin range")
+
+    names = ["Vin", "Vout", "L", "R"]
+    low = np.array([ranges[name][0] for name in names], dtype = np.float64)
+    width = np.array([ranges[name][1] for name in names]
+                     , dtype = np.float64) - low
+    shift = evaluate((low + width/2)[None, :], ord_n)[0]
+
+    tasks = [(start, min(chunk_size, n_samples - start), method, seed
+              , ord_n, low, width, shift)
+             for start in range(0, n_samples, chunk_size)]
+    if workers == 1:
+        n, sums = merge_sums(map(chunk_sums, tasks))
+    else:
+        # The pool is shut down even if the merge fails.
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            n, sums = merge_sums(executor.map(chunk_sums, tasks))
+
+    mean = sums["sum"]/(2*n)
+    variance = sums["sum_sq"]/(2*n) - mean**2
+    S1 = sums["first"]/n/variance
+    ST = sums["total"]/(2*n)/variance
+
+    columns = pd.MultiIndex.from_product([OUTPUTS, ["S1", "ST"]])
+    values = np.stack((S1, ST), axis = 2).reshape(len(names), -1)
+    return pd.DataFrame(values, index = names, columns = columns)
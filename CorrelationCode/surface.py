@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Vout x D surface of a sweep: the replicate statistic of every
+# (Vout, D) cell is aggregated into one 2D grid (rows Vout, columns D).
+# Missing cells are filled by linear interpolation on log10(D) within
+# their row, all rows at once. The surface is drawn as a heatmap with
+# contour lines, and the D of minimal transit time of every Vout (the
+# optimum ridge) is overlaid. Unlike one line or subplot per Vout, this
+# stays readable for hundreds of Vout values.
+#
+# Usage:
+#     table = transit_time_table(Vout_list, D_list, root)
+#     surface_plot(table)
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+
+from results_table import cell_summary, table_from_summary
+
+
+def surface_grid(mean_tt, statistic = "mean", aggregate = "median"):
+    """
+    This function aggregates the given column over the replicates of every
+    (Vout, D) cell and returns the Vout values, the D values and the 2D
+    array (Vout x D) of the aggregates. Missing cells are NaN.
+
+    mean_tt: the long-form table generated by
+    results_table.transit_time_table, or the dictionary generated by
+    transit_analysis.transit_time_summary.
+    statistic: the column of the table used ("mean" or "median").
+    aggregate: the aggregate over the replicates ("median" or "mean").
+    """
+    if not isinstance(mean_tt, pd.DataFrame):
+        mean_tt = table_from_summary(mean_tt)
+    Vout = mean_tt["Vout"].cat.categories
+    D = mean_tt["D"].cat.categories
+    values = (cell_summary(mean_tt, statistic)[aggregate].unstack("D")
+              .reindex(index = Vout, columns = D))
+    return (np.asarray(Vout, dtype = np.float64)
+            , np.asarray(D, dtype = np.float64)
+            , values.to_numpy(dtype = np.float64))
+
+
+def fill_missing(values, D):
+    """
+    This function fills the NaN cells of every row by linear interpolation
+    on log10(D) between the nearest filled cells on both sides; cells
+    beyond the first or last filled cell take its value. Rows without any
+    filled cell stay NaN. The filled array and the mask of the filled
+    cells are returned.
+
+    values: the 2D array (Vout x D) returned by surface_grid.
+    D: the diffusion constants of the columns.
+    """
+    missing = np.isnan(values)
+    x = np.log10(D)
+    columns = np.arange(values.shape[1])
+
+    # Index of the nearest filled cell to the left and to the right.
+    left = np.maximum.accumulate(np.where(missing, -1, columns), axis = 1)
+    right = np.minimum.accumulate(np.where(missing, len(columns), columns)
+                                  [:, ::-1], axis = 1)[:, ::-1]
+    left_ok = left >= 0
+    right_ok = right < len(columns)
+    left = np.where(left_ok, left, right)
+    right = np.where(right_ok, right, left)
+    left = np.clip(left, 0, len(columns) - 1)
+    right = np.clip(right, 0, len(columns) - 1)
+
+    rows = np.arange(values.shape[0])[:, None]
+    span = x[right] - x[left]
+    weight = np.divide(x[None, :] - x[left], span, out = np.zeros_like(span)
+                       , where = span > 0)
+    interpolated = ((1 - weight)*values[rows, left]
+                    + weight*values[rows, right])
+    return np.where(missing, interpolated, values), missing
+
+
+def optimum_ridge(values, D):
+    """
+    This function returns, for every row (Vout), the D of the minimal
+    value. The minimum is refined by a parabola through the grid minimum
+    and its two neighbours on log10(D); rows without values give NaN.
+
+    values: the 2D array (Vout x D), e.g. returned by fill_missing.
+    D: the diffusion constants of the columns.
+    """
+    x = np.log10(D)
+    empty = np.all(np.isnan(values), axis = 1)
+    best = np.argmin(np.where(np.isnan(values), np.inf, values), axis = 1)
+    ridge = x[best]
+
+    inner = (best > 0) & (best < len(x) - 1) & ~empty
+    if inner.any():
+        rows = np.nonzero(inner)[0]
+        i = best[rows]
+        x0, x1, x2 = x[i - 1], x[i], x[i + 1]
+        y0, y1, y2 = values[rows, i - 1], values[rows, i], values[rows, i + 1]
+        # Vertex of the parabola through the three points.
+        numerator = (x1 - x0)**2*(y1 - y2) - (x1 - x2)**2*(y1 - y0)
+        denominator = (x1 - x0)*(y1 - y2) - (x1 - x2)*(y1 - y0)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            vertex = x1 - 0.5*numerator/denominator
+        ok = np.isfinite(vertex) & (vertex >= x0) & (vertex <= x2)
+        ridge[rows[ok]] = vertex[ok]
+
+    return np.where(empty, np.nan, 10**ridge)
+
+
+def cell_edges(centers, log = False):
+    """
+    This function returns the edges of the cells around the given
+    (sorted) centers, as needed by pcolormesh.
+
+    centers: the cell centers.
+    log: if True, the edges are the geometric midpoints.
+    """
+    centers = np.log10(centers) if log else np.asarray(centers)
+    if len(centers) == 1:
+        edges = centers[0] + np.array([-0.5, 0.5])
+    else:
+        middle = 0.5*(centers[1:] + centers[:-1])
+        edges = np.concatenate(([2*centers[0] - middle[0]], middle
+                                , [2*centers[-1] - middle[-1]]))
+    return 10**edges if log else edges
+
+
+def surface_plot(mean_tt, statistic = "mean", aggregate = "median"
+                 , n_contours = 8, log_color = True, fill = True):
+    """
+    This function draws the Vout x D surface of the transit time as a
+    heatmap with contour lines and the optimum-D ridge overlaid.
+    Interpolated cells are marked with dots.
+
+    mean_tt: the long-form table generated by
+    results_table.transit_time_table, or the dictionary generated by
+    transit_analysis.transit_time_summary.
+    statistic: the column of the table used ("mean" or "median").
+    aggregate: the aggregate over the replicates ("median" or "mean").
+    n_contours: the number of contour lines (0 for none).
+    log_color: if True, the colour scale is logarithmic.
+    fill: if True, missing cells are interpolated (see fill_missing).
+    """
+    Vout, D, values = surface_grid(mean_tt, statistic, aggregate)
+    filled = np.zeros(values.shape, dtype = bool)
+    if fill:
+        values, filled = fill_missing(values, D)
+    ridge = optimum_ridge(values, D)
+
+    fig, ax = plt.subplots(figsize = (9, 6))
+    finite = values[np.isfinite(values)]
+    norm = (LogNorm(finite.min(), finite.max())
+            if log_color and len(finite) and finite.min() > 0 else None)
+    mesh = ax.pcolormesh(cell_edges(D, log = True), cell_edges(Vout)
+                         , np.ma.masked_invalid(values), norm = norm
+                         , cmap = "viridis", shading = "flat")
+    colorbar = fig.colorbar(mesh, ax = ax)
+    colorbar.set_label("Transit Time ($min$)")
+
+    if n_contours and len(Vout) > 1 and len(D) > 1 and len(finite):
+        levels = (np.geomspace(finite.min(), finite.max(), n_contours + 2)
+                  if norm is not None
+                  else np.linspace(finite.min(), finite.max()
+                                   , n_contours + 2))[1:-1]
+        contours = ax.contour(D, Vout, np.ma.masked_invalid(values)
+                              , levels = levels, colors = "w"
+                              , linewidths = 0.6)
+        ax.clabel(contours, fmt = "%.0f", fontsize = "x-small")
+
+    if filled.any():
+        rows, columns = np.nonzero(filled)
+        ax.plot(D[columns], Vout[rows], ".", c = "w", ms = 2
+                , label = "interpolated")
+    # Markers only while they do not merge into a band.
+    ax.plot(ridge, Vout, "o-" if len(Vout) <= 30 else "-", c = "C3", ms = 3
+            , lw = 1.2, label = "optimum D")
+
+    ax.set_xscale("log", base = 10)
+    ax.set_xlabel("Diffusion Constants ($cm^2/min$)")
+    ax.set_ylabel("Vout ($ml/day$)")
+    ax.set_title("Transit Time over Vout and Diffusion Constant")
+    ax.legend(loc = "upper right", fontsize = "small")
+    plt.show()
+
+    return fig
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Pure-NumPy surrogate of the NetLogo colon transit model, calibrated to
+# the NetLogo sweep of Figures/Vout_all_together.png. The colon is a tube
+# of length L and radius R (as in τ_median); the volume flow falls
+# linearly from Vin at the entrance to Vout at the exit. Particles move
+# along the tube in 1D:
+#     dc/dt + d(u c)/dx = d/dx (K dc/dx),
+#     u = VELOCITY_FACTOR Q(x)/(pi R^2),
+#     K = D + DISPERSION u^DISPERSION_EXPONENT/D,
+# where the second term of K is the dispersion by the flow (of the form
+# of Taylor-Aris dispersion, u^2 R^2/(48 D), with a fitted coefficient
+# and exponent). Both ends are closed to dispersion: a particle only
+# leaves when the flow carries it over x = L, and its tick is recorded
+# like turtle_die_tick. Large K mixes the particles back along the tube,
+# so the transit time has a minimum in D: the dispersion by the flow
+# dominates for small D, the diffusion for large D.
+#
+# The three constants were fitted to the 30 means of NETLOGO_MEAN (see
+# advection_diffusion, which solves the same equation without noise);
+# they agree within 1.2 % (rms 0.5 %), inside the read-off error of the
+# figure. VELOCITY_FACTOR is close to 2, the speed on the axis of a
+# Poiseuille flow. The calibration covers Vin = 1500, L = 30, R = 2.5,
+# Vout = 100-400 and D = 0.01-0.6; outside this range the surrogate is an
+# extrapolation. reference_check compares a sweep with NETLOGO_MEAN and
+# τ_median.
+#
+# All particles of a batch are advanced together with vectorised random
+# walk steps. Replicates run on several cores and can be written as .txt
+# files in the NetLogo format or streamed straight into the reducers of
+# results_table.py.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from results_table import cell_summary, make_table, replicate_statistics
+from synthetic_sweep import write_replicate
+from transit_analysis import cell_direction
+from transit_theory import τ_median
+
+
+# Default geometry and inflow, as used in the theoretical curves (R is
+# the radius).
+VIN = 1500.
+L = 30.
+R = 2.5
+
+# Calibration to NETLOGO_MEAN (least squares on the log means).
+VELOCITY_FACTOR = 2.03
+DISPERSION = 10.6
+DISPERSION_EXPONENT = 2.78
+
+# Mean transit times (min) of the NetLogo sweep, read off
+# Figures/Vout_all_together.png, {Vout: {D: mean}}.
+NETLOGO_MEAN = {100: {0.01: 1147, 0.02: 1085, 0.05: 1165, 0.1: 1337
+                      , 0.2: 1628, 0.6: 2370}
+                , 150: {0.01: 978, 0.02: 897, 0.05: 919, 0.1: 1016
+                        , 0.2: 1187, 0.6: 1658}
+                , 200: {0.01: 872, 0.02: 794, 0.05: 791, 0.1: 845
+                        , 0.2: 954, 0.6: 1288}
+                , 300: {0.01: 739, 0.02: 670, 0.05: 642, 0.1: 668
+                        , 0.2: 725, 0.6: 913}
+                , 400: {0.01: 660, 0.02: 592, 0.05: 561, 0.1: 572
+                        , 0.2: 605, 0.6: 727}}
+# Relative read-off error of NETLOGO_MEAN.
+NETLOGO_ERROR = 0.03
+
+
+def mean_velocity(x, Vin, Vout, L, R):
+    """
+    This function returns the mean flow velocity (cm/min) over the
+    cross-section at the position x (cm). The volume flow (ml/day) falls
+    linearly from Vin at x = 0 to Vout at x = L.
+
+    x: the positions along the tube.
+    Vin: the inflow volume.
+    Vout: the outflow volume.
+    L: the length of the simulated colon.
+    R: the radius of the simulated colon.
+    """
+    flow = Vin - (Vin - Vout)*np.clip(x, 0., L)/L
+    return flow/(np.pi*R**2)/1440.
+
+
+def particle_velocity(x, Vin, Vout, L, R):
+    """
+    This function returns the velocity (cm/min) with which the flow
+    carries the particles at the position x (cm), VELOCITY_FACTOR times
+    the mean flow velocity.
+
+    x: the positions along the tube.
+    Vin, Vout, L, R: see mean_velocity.
+    """
+    return VELOCITY_FACTOR*mean_velocity(x, Vin, Vout, L, R)
+
+
+def dispersion(u, D, coefficient = DISPERSION
+               , exponent = DISPERSION_EXPONENT):
+    """
+    This function returns the dispersion coefficient K (cm^2/min) of the
+    particles: the diffusion constant plus the dispersion by the flow,
+    coefficient*u^exponent/D.
+
+    u: the particle velocity (cm/min).
+    D: the diffusion constant (cm^2/min).
+    coefficient, exponent: the dispersion by the flow (calibrated values
+    by default).
+    """
+    return D + coefficient*u**exponent/D
+
+
+def simulate_batch(Vout, D, n_particles, rng, Vin = VIN, L = L, R = R
+                   , tick = 1., max_ticks = 100000, substeps = 4):
+    """
+    This function simulates n_particles particles entering the tube at
+    x = 0 until the flow carries them over x = L or max_ticks is reached.
+    The exit ticks of all particles that left and the number of particles
+    still inside at the end (right-censored) are returned.
+
+    Vout: the outflow volume.
+    D: the diffusion constant (cm^2/min).
+    n_particles: the number of particles.
+    rng: a numpy random Generator.
+    Vin, L, R: inflow volume, length and radius of the colon.
+    tick: the length of one tick in minutes.
+    max_ticks: the length of the run in ticks.
+    substeps: the number of random walk steps per tick.
+    """
+    x = np.zeros(n_particles)
+    dt = tick/substeps
+    # K varies along the tube; its gradient enters the drift (Ito form).
+    du_dx = -VELOCITY_FACTOR*(Vin - Vout)/(L*np.pi*R**2*1440.)
+    exit_ticks = []
+
+    for t in range(1, max_ticks + 1):
+        for _ in range(substeps):
+            u = particle_velocity(x, Vin, Vout, L, R)
+            dK_dx = (DISPERSION*DISPERSION_EXPONENT
+                     *u**(DISPERSION_EXPONENT - 1)*du_dx/D)
+            # Dispersion, reflected at the closed entrance and exit.
+            x += (dK_dx*dt + np.sqrt(2*dispersion(u, D)*dt)
+                  *rng.standard_normal(len(x)))
+            np.abs(x, out = x)
+            beyond = x > L
+            x[beyond] = 2*L - x[beyond]
+            # Advection with the velocity at the new position; only the
+            # flow carries particles out.
+            x += particle_velocity(x, Vin, Vout, L, R)*dt
+            left = x >= L
+            if left.any():
+                exit_ticks.append(np.full(np.count_nonzero(left), t))
+                x = x[~left]
+        if len(x) == 0:
+            break
+
+    if exit_ticks:
+        exit_ticks = np.concatenate(exit_ticks)
+    else:
+        exit_ticks = np.zeros(0, dtype = np.int64)
+    return exit_ticks, len(x)
+
+
+def simulate_replicate(Vout, D, n_particles, seed, batch_size = 10000
+                       , **kwargs):
+    """
+    This function simulates one replicate in batches of batch_size
+    particles, which bounds the memory use. The exit ticks of all
+    particles and the number of censored particles are returned.
+
+    Vout: the outflow volume.
+    D: the diffusion constant.
+    n_particles: the number of particles in the replicate.
+    seed: seed (or SeedSequence) of the random generator.
+    batch_size: the number of particles advanced together.
+    kwargs: further arguments of simulate_batch (Vin, L, R, tick,
+    max_ticks).
+    """
+    rng = np.random.default_rng(seed)
+    all_ticks = []
+    n_censored = 0
+    for start in range(0, n_particles, batch_size):
+        n_batch = min(batch_size, n_particles - start)
+        ticks, censored = simulate_batch(Vout, D, n_batch, rng, **kwargs)
+        all_ticks.append(ticks)
+        n_censored += censored
+    return np.sort(np.concatenate(all_ticks)), n_censored
+
+
+def _run_task(task):
+    Vout, D, replicate, n_particles, seed, kwargs = task
+    ticks, n_censored = simulate_replicate(Vout, D, n_particles, seed
+                                           , **kwargs)
+    return Vout, D, replicate, ticks, n_censored
+
+
+def simulate_sweep(Vout_list, D_list, n_replicates, n_particles, seed = 0
+                   , workers = None, **kwargs):
+    """
+    This function simulates n_replicates replicates for every (Vout, D)
+    on a process pool and yields (Vout, D, replicate, ticks, n_censored)
+    for every replicate as soon as it is finished. Every replicate gets
+    its own random stream, so the results do not depend on the number of
+    workers.
+    On Windows the call has to be inside an
+    'if __name__ == "__main__":' block when used from a script.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    n_replicates: the number of replicates per (Vout, D).
+    n_particles: the number of particles per replicate.
+    seed: the seed of the whole sweep.
+    workers: the number of processes (default: number of cores). With
+    workers = 1 the replicates are simulated in this process.
+    kwargs: further arguments of simulate_replicate.
+    """
+    n_tasks = len(Vout_list)*len(D_list)*n_replicates
+    seeds = iter(np.random.SeedSequence(seed).spawn(n_tasks))
+    tasks = [(Vout, D, i, n_particles, next(seeds), kwargs)
+             for Vout in Vout_list for D in D_list
+             for i in range(n_replicates)]
+
+    if workers == 1:
+        for task in tasks:
+            yield _run_task(task)
+        return
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        for result in executor.map(_run_task, tasks):
+            yield result
+
+
+def simulated_table(Vout_list, D_list, n_replicates, n_particles, root = None
+                    , seed = 0, workers = None, **kwargs):
+    """
+    This function runs simulate_sweep and reduces every replicate as it
+    arrives to the long-form table of results_table (with the additional
+    column n_censored). If root is given, every replicate is also written
+    as root/Vout=.../Diff=.../replicate_<i>.txt in the NetLogo format, so
+    that read_txt and transit_time_summary can read it.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    n_replicates: the number of replicates per (Vout, D).
+    n_particles: the number of particles per replicate.
+    root: optional folder for the .txt files.
+    seed: the seed of the whole sweep.
+    workers: the number of processes.
+    kwargs: further arguments of simulate_replicate.
+    """
+    Vout_values = []
+    D_values = []
+    replicates = []
+    statistics = []
+    n_censored = []
+
+    for Vout, D, i, ticks, censored in simulate_sweep(
+            Vout_list, D_list, n_replicates, n_particles, seed, workers
+            , **kwargs):
+        if root is not None:
+            direction = cell_direction(root, Vout, D)
+            os.makedirs(direction, exist_ok = True)
+            write_replicate(os.path.join(direction
+                                         , "replicate_" + str(i) + ".txt")
+                            , ticks)
+        Vout_values.append(Vout)
+        D_values.append(D)
+        replicates.append(i)
+        statistics.append(replicate_statistics([ticks]))
+        n_censored.append(censored)
+
+    table = make_table(Vout_values, D_values, replicates, statistics)
+    table["n_censored"] = np.asarray(n_censored, dtype = np.int64)
+    return table
+
+
+def reference_check(table, Vin = VIN, L = L, R = R):
+    """
+    This function compares the transit times of a sweep (e.g. from
+    simulated_table) with the NetLogo means of NETLOGO_MEAN and with
+    τ_median, for every (Vout, D) cell found in both. A DataFrame indexed
+    by Vout and D is returned with the mean over the replicates of the
+    mean transit time, its standard error (0 without the columns n and
+    std), the NetLogo mean, their ratio, "agrees" (the ratio is within
+    NETLOGO_ERROR plus two standard errors of 1), the median over the
+    replicates of the median transit time, τ_median and their ratio.
+    Within every Vout, netlogo_trend and trend give the means relative to
+    the smallest D.
+
+    table: the long-form table of the sweep.
+    Vin, L, R: inflow volume, length and radius of the colon.
+    """
+    means = cell_summary(table, "mean")
+    medians = cell_summary(table, "median")["median"]
+    if "n" in table and "std" in table:
+        keys = [table["Vout"], table["D"]]
+        variance = ((table["std"]**2/table["n"]).astype(np.float64)
+                    .groupby(keys, observed = True, sort = True).sum())
+        errors = np.sqrt(variance)/means["count"]
+    else:
+        errors = pd.Series(0., index = means.index)
+
+    rows = {}
+    for (Vout, D), mean in means["mean"].items():
+        netlogo = NETLOGO_MEAN.get(Vout, {}).get(D)
+        if netlogo is None:
+            continue
+        error = errors[(Vout, D)]
+        tau = float(τ_median(Vin, Vout, L, R))
+        rows[(Vout, D)] = {"mean": mean, "error": error
+                           , "netlogo": float(netlogo)
+                           , "ratio": mean/netlogo
+                           , "agrees": abs(mean/netlogo - 1)
+                           <= NETLOGO_ERROR + 2*error/mean
+                           , "median": medians[(Vout, D)]
+                           , "tau_median": tau
+                           , "median_ratio": medians[(Vout, D)]/tau}
+    check = pd.DataFrame.from_dict(rows, orient = "index")
+    if len(check) == 0:
+        return check
+    check.index.names = ["Vout", "D"]
+    first = check.groupby(level = "Vout").transform("first")
+    check["netlogo_trend"] = check["netlogo"]/first["netlogo"]
+    check["trend"] = check["mean"]/first["mean"]
+    return check
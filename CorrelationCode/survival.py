@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Censoring-aware transit times. The .txt files only hold the particles
+# that left before the end of the run, so for slow settings (small Vout,
+# small D) the plain means are biased low. Here every particle still
+# inside at the end of the run is a right-censored observation, and the
+# Kaplan-Meier estimate of the survival function S(t) gives the median
+# and the restricted mean transit time (area under S up to tau).
+#
+# Every replicate is reduced to counts per distinct exit time (a bincount
+# for integer ticks, one sort otherwise) and the counts of all replicates
+# of a cell are merged, so a cell with tens of millions of particles is
+# read block by block and only its distinct times are kept. The curve is
+# then computed with cumulative sums over these times.
+#
+# Usage:
+#     summary, curves = survival_table(Vout_list, D_list, root
+#                                      , run_length = 100000
+#                                      , n_particles = 50000)
+#     # or directly from the surrogate simulator:
+#     summary, curves = simulated_survival(Vout_list, D_list, 5, 10000
+#                                          , max_ticks = 20000)
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from surrogate_simulator import simulate_sweep
+from transit_analysis import (DATA_ROOT, cell_direction, read_transit_chunks
+                              , replicate_files)
+
+
+SUMMARY_COLUMNS = ["n_events", "n_censored", "median", "rmst", "tau"
+                   , "naive_mean"]
+
+
+def time_counts(times):
+    """
+    This function returns the distinct times and the number of
+    observations at each of them. Integer times with a moderate range are
+    counted with np.bincount (no sort), others are sorted once.
+
+    times: a 1D array of times.
+    """
+    times = np.asarray(times)
+    if len(times) == 0:
+        return np.zeros(0), np.zeros(0, dtype = np.int64)
+    if np.issubdtype(times.dtype, np.integer):
+        low = times.min()
+        span = int(times.max() - low) + 1
+        if span <= 4*len(times) + 1024:
+            counts = np.bincount(times - low, minlength = span)
+            present = np.nonzero(counts)[0]
+            return (present + low).astype(np.float64), counts[present]
+    distinct, counts = np.unique(times, return_counts = True)
+    return distinct.astype(np.float64), counts.astype(np.int64)
+
+
+def merge_counts(*pairs):
+    """
+    This function merges several (times, counts) pairs into one.
+
+    pairs: (times, counts) pairs as returned by time_counts.
+    """
+    times = np.concatenate([pair[0] for pair in pairs])
+    counts = np.concatenate([pair[1] for pair in pairs])
+    distinct, inverse = np.unique(times, return_inverse = True)
+    return distinct, np.bincount(inverse, weights = counts
+                                 , minlength = len(distinct)).astype(np.int64)
+
+
+def replicate_events(docu, chunksize = 1000000):
+    """
+    This function reads the exit times of one .txt file block by block and
+    returns them as (times, counts).
+
+    docu: the path of the .txt file.
+    chunksize: the number of rows read at once.
+    """
+    events = (np.zeros(0), np.zeros(0, dtype = np.int64))
+    for chunk in read_transit_chunks(docu, chunksize):
+        events = merge_counts(events, time_counts(chunk))
+    return events
+
+
+def kaplan_meier(events, censored):
+    """
+    This function computes the Kaplan-Meier estimate of the survival
+    function. A particle censored at the time of an event is counted as
+    still at risk at that event. A DataFrame with one row per distinct
+    event time (time, at_risk, events, survival, std_error (Greenwood)) is
+    returned.
+
+    events: (times, counts) of the exits.
+    censored: (times, counts) of the censored particles.
+    """
+    event_times, event_counts = events
+    censor_times, censor_counts = censored
+    n_total = event_counts.sum() + censor_counts.sum()
+
+    # Observations that left the risk set before every event time.
+    events_before = np.cumsum(event_counts) - event_counts
+    censored_cumulative = np.concatenate(([0], np.cumsum(censor_counts)))
+    censored_before = censored_cumulative[np.searchsorted(
+        censor_times, event_times, side = "left")]
+    at_risk = n_total - events_before - censored_before
+
+    hazard = event_counts/at_risk
+    survival = np.cumprod(1 - hazard)
+    # Greenwood's formula; the last term is infinite if all left, where
+    # the survival (and its error) is 0.
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        greenwood = np.cumsum(event_counts/(at_risk*(at_risk
+                                                     - event_counts)))
+        std_error = np.where(survival > 0, survival*np.sqrt(greenwood), 0.)
+    return pd.DataFrame({"time": event_times, "at_risk": at_risk
+                         , "events": event_counts, "survival": survival
+                         , "std_error": std_error})
+
+
+def km_median(curve):
+    """
+    This function returns the median transit time, the first time with
+    S(t) <= 0.5, or NaN if more than half of the particles were censored
+    before that.
+
+    curve: the DataFrame returned by kaplan_meier.
+    """
+    below = np.nonzero(curve["survival"].to_numpy() <= 0.5)[0]
+    return curve["time"].iloc[below[0]] if len(below) else np.nan
+
+
+def restricted_mean(curve, tau):
+    """
+    This function returns the restricted mean transit time, the integral
+    of the survival step function from 0 to tau.
+
+    curve: the DataFrame returned by kaplan_meier.
+    tau: the upper limit of the integral.
+    """
+    times = curve["time"].to_numpy()
+    survival = curve["survival"].to_numpy()
+    # S = 1 before the first event and S[i] from times[i] on.
+    starts = np.concatenate(([0.], times))
+    levels = np.concatenate(([1.], survival))
+    ends = np.concatenate((times, [np.inf]))
+    widths = np.clip(np.minimum(ends, tau) - starts, 0., None)
+    return float(np.sum(widths*levels))
+
+
+def summarise(events, censored, tau = None):
+    """
+    This function returns the Kaplan-Meier curve and a dictionary with
+    the entries of SUMMARY_COLUMNS for one cell.
+
+    events: (times, counts) of the exits.
+    censored: (times, counts) of the censored particles.
+    tau: the upper limit of the restricted mean. Default: the last
+    censoring or event time.
+    """
+    curve = kaplan_meier(events, censored)
+    n_events = int(events[1].sum())
+    if tau is None:
+        tau = max(events[0].max() if len(events[0]) else 0.
+                  , censored[0].max() if len(censored[0]) else 0.)
+    naive_mean = (np.sum(events[0]*events[1])/n_events if n_events
+                  else np.nan)
+    return curve, {"n_events": n_events
+                   , "n_censored": int(censored[1].sum())
+                   , "median": km_median(curve)
+                   , "rmst": restricted_mean(curve, tau)
+                   , "tau": float(tau), "naive_mean": naive_mean}
+
+
+def summary_frame(rows):
+    """
+    This function turns a dictionary {(Vout, D): summary} into a DataFrame
+    indexed by Vout and D.
+    """
+    index = pd.MultiIndex.from_tuples(list(rows), names = ["Vout", "D"])
+    return pd.DataFrame(list(rows.values()), index = index
+                        , columns = SUMMARY_COLUMNS)
+
+
+def survival_table(Vout_list, D_list, root = DATA_ROOT, run_length = None
+                   , n_particles = None, tau = None, chunksize = 1000000):
+    """
+    This function pools all replicates of every (Vout, D) cell and
+    estimates the survival of the particles. Every replicate is assumed to
+    have released n_particles particles; those not found in its file are
+    censored at run_length. A summary DataFrame (index Vout, D; columns
+    SUMMARY_COLUMNS) and a dictionary {(Vout, D): Kaplan-Meier curve} are
+    returned.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    root: the folder containing all Vout=... folders.
+    run_length: the length of a run in ticks (the censoring time).
+    n_particles: the number of particles released per replicate. If None,
+    nothing is censored and the estimates equal the plain ones.
+    tau: the upper limit of the restricted mean. Default: run_length.
+    chunksize: the number of rows read at once.
+    """
+    if n_particles is not None and run_length is None:
+        raise ValueError("censoring with n_particles needs the run_length")
+    if tau is None:
+        tau = run_length
+
+    rows = {}
+    curves = {}
+    for Vout in Vout_list:
+        for D in D_list:
+            all_events = []
+            n_censored = 0
+            for docu in replicate_files(cell_direction(root, Vout, D)):
+                events = replicate_events(docu, chunksize)
+                all_events.append(events)
+                if n_particles is not None:
+                    n_left = int(events[1].sum())
+                    if n_left > n_particles:
+                        raise ValueError(docu + " holds " + str(n_left)
+                                         + " particles, more than "
+                                         + "n_particles")
+                    n_censored += n_particles - n_left
+            if not all_events:
+                continue
+            censored = (np.array([float(run_length or 0)])
+                        , np.array([n_censored], dtype = np.int64))
+            curves[(Vout, D)], rows[(Vout, D)] = summarise(
+                merge_counts(*all_events), censored, tau)
+
+    return summary_frame(rows), curves
+
+
+def simulated_survival(Vout_list, D_list, n_replicates, n_particles
+                       , max_ticks = 100000, tau = None, seed = 0
+                       , workers = None, **kwargs):
+    """
+    This function runs the surrogate simulator (see
+    surrogate_simulator.simulate_sweep), which reports the particles still
+    inside at max_ticks, and returns the survival summary and curves as
+    survival_table does.
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    n_replicates: the number of replicates per (Vout, D).
+    n_particles: the number of particles per replicate.
+    max_ticks: the length of a run in ticks (the censoring time).
+    tau: the upper limit of the restricted mean. Default: max_ticks.
+    seed: the seed of the whole sweep.
+    workers: the number of processes.
+    kwargs: further arguments of simulate_replicate.
+    """
+    if tau is None:
+        tau = max_ticks
+    events = {}
+    n_censored = {}
+    for Vout, D, _, ticks, censored in simulate_sweep(
+            Vout_list, D_list, n_replicates, n_particles, seed, workers
+            , max_ticks = max_ticks, **kwargs):
+        events.setdefault((Vout, D), []).append(time_counts(ticks))
+        n_censored[(Vout, D)] = n_censored.get((Vout, D), 0) + censored
+
+    rows = {}
+    curves = {}
+    for cell in sorted(events):
+        censored = (np.array([float(max_ticks)])
+                    , np.array([n_censored[cell]], dtype = np.int64))
+        curves[cell], rows[cell] = summarise(merge_counts(*events[cell])
+                                             , censored, tau)
+    return summary_frame(rows), curves
+
+
+def survival_plot(curves, Vout):
+    """
+    This function draws the Kaplan-Meier curves of all D values of one
+    Vout, with the median level marked.
+
+    curves: the dictionary of curves returned by survival_table.
+    Vout: the Vout value shown.
+    """
+    fig, ax = plt.subplots(figsize = (8, 5))
+    for (current_Vout, D) in sorted(curves):
+        if current_Vout != Vout:
+            continue
+        curve = curves[(current_Vout, D)]
+        ax.step(np.concatenate(([0.], curve["time"]))
+                , np.concatenate(([1.], curve["survival"]))
+                , where = "post", label = "D=" + str(D))
+    ax.axhline(0.5, c = "grey", lw = 0.8, ls = "--")
+    ax.set_xlabel("Transit Time ($min$)")
+    ax.set_ylabel("Fraction still in the colon")
+    ax.set_title("Kaplan-Meier Survival, Vout=" + str(Vout))
+    ax.legend(fontsize = "small")
+    plt.show()
+
+    return fig
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Lazy queries over the sweep catalog root/Vout=.../Diff=.../*.txt.
+# where() only records predicates on Vout and D; they are applied to the
+# folder names while the catalog is discovered, so folders outside the
+# selection are never listed or opened. Results are computed only when a
+# terminal method (table, mean_transit, histograms, ...) is called, and the
+# statistics of every cell read once are kept in a cache shared by all
+# queries derived from the same Sweep.
+#
+# Usage:
+#     sweep = Sweep(root)
+#     subset = sweep.where(Vout = [100, 150], D = between(0.01, 0.1))
+#     mean_tt = subset.mean_transit()
+#     mean_transit_time_lineplot(mean_tt)
+
+import os
+import numpy as np
+import pandas as pd
+
+from distribution_plots import replicate_histogram
+from results_table import file_statistics, make_table, table_to_summary
+from transit_analysis import DATA_ROOT, parse_folder, replicate_files
+
+
+def between(low, high):
+    """
+    This function returns a predicate selecting values with
+    low <= value <= high, for use in Sweep.where.
+
+    low: the lower bound (inclusive).
+    high: the upper bound (inclusive).
+    """
+    return lambda value: low <= value <= high
+
+
+def as_predicate(selection):
+    """
+    This function turns a selection given to Sweep.where into a predicate:
+    None selects everything, a callable is used as it is, a list (or set,
+    tuple, array) selects its members and a single value selects itself.
+
+    selection: the selection.
+    """
+    if selection is None:
+        return lambda value: True
+    if callable(selection):
+        return selection
+    if np.ndim(selection) == 0:
+        selection = [selection]
+    # Compare numbers with a tolerance; folder names are parsed as floats.
+    values = np.asarray(list(selection), dtype = np.float64)
+    return lambda value: bool(np.any(np.isclose(values, value, rtol = 1e-9
+                                                , atol = 0.)))
+
+
+def list_values(direction, prefix):
+    """
+    This function returns the sorted (value, path) pairs of all
+    subfolders of direction whose names start with prefix.
+
+    direction: the folder to list.
+    prefix: "Vout=" or "Diff=".
+    """
+    values = []
+    with os.scandir(direction) as entries:
+        for entry in entries:
+            value = parse_folder(entry.name, prefix)
+            if value is not None and entry.is_dir():
+                values.append((value, entry.path))
+    return sorted(values)
+
+
+class Sweep:
+    """
+    Lazy query over the sweep stored under root. Selections are added
+    with where(); nothing is read before a terminal method is called.
+
+    root: the folder containing all Vout=... folders.
+    """
+    def __init__(self, root = DATA_ROOT, _predicates = (), _cache = None):
+        self.root = root
+        self.predicates = tuple(_predicates)
+        self.cache = {} if _cache is None else _cache
+
+    def where(self, Vout = None, D = None):
+        """
+        This function returns a new query restricted to the given Vout
+        and D values (a list, a single value, a callable such as
+        between(low, high), or None for all). Several where() calls are
+        combined with "and".
+
+        Vout: the selection of Vout values.
+        D: the selection of diffusion constants.
+        """
+        return Sweep(self.root, self.predicates
+                     + ((as_predicate(Vout), as_predicate(D)),)
+                     , self.cache)
+
+    def accepts_Vout(self, Vout):
+        return all(Vout_predicate(Vout)
+                   for Vout_predicate, _ in self.predicates)
+
+    def accepts_D(self, D):
+        return all(D_predicate(D) for _, D_predicate in self.predicates)
+
+    def cells(self):
+        """
+        This function discovers the selected cells. Only the root folder
+        and the selected Vout=... folders are listed. A list of
+        (Vout, D, direction) tuples is returned.
+        """
+        selected = []
+        for Vout, Vout_direction in list_values(self.root, "Vout="):
+            if not self.accepts_Vout(Vout):
+                continue
+            for D, direction in list_values(Vout_direction, "Diff="):
+                if self.accepts_D(D):
+                    selected.append((Vout, D, direction))
+        return selected
+
+    def files(self):
+        """
+        This function returns the replicate files of the selected cells as
+        a DataFrame with the columns Vout, D and file.
+        """
+        rows = [(Vout, D, docu) for Vout, D, direction in self.cells()
+                for docu in replicate_files(direction)]
+        return pd.DataFrame(rows, columns = ["Vout", "D", "file"])
+
+    def cell_rows(self, Vout, D, direction, chunksize = None):
+        """
+        This function returns the statistics of one cell (one row per
+        replicate), reading the cell only if it is not in the cache.
+
+        Vout, D: the cell.
+        direction: the folder of the cell.
+        chunksize: if given, files are read in blocks of chunksize rows.
+        """
+        key = (Vout, D, chunksize)
+        if key not in self.cache:
+            self.cache[key] = [file_statistics(docu, chunksize) for docu
+                               in replicate_files(direction)]
+        return self.cache[key]
+
+    def table(self, chunksize = None):
+        """
+        This function computes the long-form table (see results_table) of
+        the selected cells.
+
+        chunksize: if given, files are read in blocks of chunksize rows.
+        """
+        Vout_values = []
+        D_values = []
+        replicates = []
+        statistics = []
+        for Vout, D, direction in self.cells():
+            for i, row in enumerate(self.cell_rows(Vout, D, direction
+                                                   , chunksize)):
+                Vout_values.append(Vout)
+                D_values.append(D)
+                replicates.append(i)
+                statistics.append(row)
+        return make_table(Vout_values, D_values, replicates, statistics)
+
+    def mean_transit(self, chunksize = None):
+        """
+        This function returns the mean transit time of every replicate of
+        the selected cells in the nested dictionary format of
+        transit_time_summary, ready for the plotting functions.
+
+        chunksize: if given, files are read in blocks of chunksize rows.
+        """
+        return table_to_summary(self.table(chunksize), "mean")
+
+    def median_transit(self):
+        """
+        This function returns the median transit time of every replicate
+        in the nested dictionary format of transit_time_summary.
+        """
+        return table_to_summary(self.table(), "median")
+
+    def histograms(self, grid, chunksize = 1000000):
+        """
+        This function returns the histogram aggregates (see
+        distribution_plots) of the selected cells and the numbers of
+        transit times outside the grid, as histogram_table does.
+
+        grid: the grid returned by distribution_plots.transit_grid.
+        chunksize: the number of rows read at once.
+        """
+        histograms = {}
+        outside = {}
+        for Vout, D, direction in self.cells():
+            counts = np.zeros(len(grid))
+            n_outside = 0
+            for docu in replicate_files(direction):
+                replicate_counts, replicate_outside = replicate_histogram(
+                    docu, grid, chunksize)
+                counts += replicate_counts
+                n_outside += replicate_outside
+            histograms[(Vout, D)] = counts
+            outside[(Vout, D)] = n_outside
+        return histograms, outside
+
+    def __repr__(self):
+        return ("Sweep(" + repr(self.root) + ", "
+                + str(len(self.predicates)) + " selection(s))")
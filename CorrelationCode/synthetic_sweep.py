@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Generator for synthetic NetLogo-style replicate trees
+# (root/Vout=.../Diff=.../*.txt). The files have the same heading row and
+# "  turtle_die_tick " column as the simulation output, so every function
+# in transit_analysis.py can run on them without the real data drive.
+
+import os
+import numpy as np
+
+from transit_analysis import cell_direction, TRANSIT_COLUMN
+
+
+# First (skipped) row and column row of every replicate file.
+HEADING_ROW = "transit time output (synthetic)"
+COLUMN_ROW = "turtle_who," + TRANSIT_COLUMN
+
+
+def synthetic_transit_times(Vout, D, n_rows, rng):
+    """
+    This function draws n_rows synthetic transit times (in ticks) for one
+    replicate. The values are gamma distributed with a median that falls
+    with Vout and has a minimum in D, which mimics the shape of the
+    simulation results closely enough for benchmarking.
+
+    Vout: the outflow volume.
+    D: the diffusion constant.
+    n_rows: the number of particles (rows) in the replicate.
+    rng: a numpy random Generator.
+    """
+    scale = 1500./Vout*100.*(1. + 0.5*np.log10(D/0.05)**2)
+    transit_time = rng.gamma(2., scale, size = n_rows)
+    return np.ceil(transit_time).astype(np.int64)
+
+
+def write_replicate(path, transit_time):
+    """
+    This function writes one replicate file with the NetLogo heading row
+    and the transit time column.
+
+    path: the path of the .txt file.
+    transit_time: a numpy array containing the transit times.
+    """
+    body = np.column_stack((np.arange(len(transit_time)), transit_time))
+    with open(path, "w") as f:
+        f.write(HEADING_ROW + "\n" + COLUMN_ROW + "\n")
+        np.savetxt(f, body, fmt = "%d", delimiter = ",")
+
+
+def generate_sweep(root, Vout_list, D_list, n_replicates, n_rows, seed = 0):
+    """
+    This function generates a synthetic replicate tree under root with
+    one folder per (Vout, D) and n_replicates .txt files per folder.
+    The total number of written rows is returned.
+
+    root: the folder in which the Vout=... folders are created.
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    n_replicates: the number of replicate files per (Vout, D).
+    n_rows: the number of rows (particles) per replicate file.
+    seed: seed of the random generator.
+    """
+    rng = np.random.default_rng(seed)
+    total_rows = 0
+
+    for Vout in Vout_list:
+        for D in D_list:
+            direction = cell_direction(root, Vout, D)
+            os.makedirs(direction, exist_ok = True)
+
+            for i in range(n_replicates):
+                transit_time = synthetic_transit_times(Vout, D, n_rows, rng)
+                path = os.path.join(direction, "replicate_" + str(i) + ".txt")
+                write_replicate(path, transit_time)
+                total_rows += n_rows
+
+    return total_rows
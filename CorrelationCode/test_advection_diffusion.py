@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks of the advection-diffusion solver against analytic limits and
+# the NetLogo means the model is calibrated to.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_advection_diffusion.py
+
+import numpy as np
+
+from advection_diffusion import (reference_table, survival_density
+                                 , transit_modes, transit_time_distribution)
+from surrogate_simulator import (L, NETLOGO_MEAN, R, VELOCITY_FACTOR
+                                 , reference_check)
+
+
+def test_well_mixed_limit():
+    # For very large D the tube is a well-mixed tank: exponential transit
+    # times with the mean residence time A*L/Vout, shortened by the
+    # particle velocity VELOCITY_FACTOR times the flow velocity.
+    table = reference_table([100, 400], [1e4])
+    tank = 1440.*np.pi*R**2*L/(VELOCITY_FACTOR*table["Vout"])
+    assert np.allclose(table["mean"], tank, rtol = 1e-3)
+    assert np.allclose(table["median"], np.log(2.)*tank, rtol = 1e-3)
+
+
+def test_mean_is_integral_of_survival():
+    result = transit_time_distribution([100, 400], [0.01, 0.6]
+                                       , times = np.linspace(0., 1e5, 200001))
+    assert np.allclose(result["survival"][:, 0], 1.)
+    assert np.allclose(np.trapezoid(result["survival"], result["times"])
+                       , result["mean"], rtol = 1e-4)
+
+
+def test_means_agree_with_netlogo():
+    table = reference_table(list(NETLOGO_MEAN)
+                            , [0.01, 0.02, 0.05, 0.1, 0.2, 0.6])
+    check = reference_check(table)
+    assert len(check) == 30
+    assert check["agrees"].all()
+
+
+def test_chunks_match_one_block():
+    rates, amplitudes = transit_modes(np.array([100., 400., 400.])
+                                      , np.array([0.01, 0.05, 0.6]))
+    times = np.linspace(0., 5000., 101)
+    chunked = survival_density(rates, amplitudes, times
+                               , max_elements = len(times))
+    whole = survival_density(rates, amplitudes, times)
+    assert np.array_equal(chunked[0], whole[0])
+    assert np.array_equal(chunked[1], whole[1])
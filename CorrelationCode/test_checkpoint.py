@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Quarantine and resume of checkpoint.checkpointed_table on a synthetic
+# sweep with a truncated replicate.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_checkpoint.py
+
+import os
+import shutil
+
+from checkpoint import cell_checkpoint_path, checkpointed_table
+from results_table import STATISTICS, transit_time_table
+from synthetic_sweep import generate_sweep
+from transit_analysis import cell_direction
+
+
+VOUT_LIST = [100, 400]
+D_LIST = [0.01, 0.6]
+
+
+def test_quarantined_cell_is_retried(tmp_path):
+    root = str(tmp_path/"sweep")
+    checkpoint_dir = str(tmp_path/"checkpoints")
+    generate_sweep(root, VOUT_LIST, D_LIST, 2, 500)
+    fresh = transit_time_table(VOUT_LIST, D_LIST, root)
+
+    # A replicate that is still being written: last row cut to one field.
+    docu = os.path.join(cell_direction(root, 100, 0.6), "replicate_1.txt")
+    shutil.copy(docu, str(tmp_path/"complete.txt"))
+    with open(docu) as f:
+        text = f.read()
+    with open(docu, "w") as f:
+        f.write(text[:text.rstrip("\n").rindex(",")])
+
+    table, quarantine = checkpointed_table(VOUT_LIST, D_LIST
+                                           , checkpoint_dir, root)
+    assert list(quarantine["file"]) == [docu]
+    assert len(table) == len(fresh) - 1
+    assert not os.path.exists(cell_checkpoint_path(checkpoint_dir, 100, 0.6))
+    assert os.path.exists(cell_checkpoint_path(checkpoint_dir, 400, 0.6))
+
+    # Still listed while the file is incomplete, never twice.
+    quarantine = checkpointed_table(VOUT_LIST, D_LIST, checkpoint_dir
+                                    , root)[1]
+    assert list(quarantine["file"]) == [docu]
+
+    # Once the file is complete, the cell is read again.
+    shutil.copy(str(tmp_path/"complete.txt"), docu)
+    table, quarantine = checkpointed_table(VOUT_LIST, D_LIST
+                                           , checkpoint_dir, root)
+    assert len(quarantine) == 0
+    assert table[STATISTICS].equals(fresh[STATISTICS])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Determinism of the reductions on a synthetic sweep: the statistics have
+# to be bit-identical for chunked and in-memory reading, for one or
+# several workers, and for a resumed and a fresh checkpointed run. Every
+# cell gets one float replicate longer than REDUCTION_BLOCK next to the
+# integer synthetic ones, so the order of the summation matters.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_determinism.py
+
+import os
+import numpy as np
+import pytest
+
+from checkpoint import cell_checkpoint_path, checkpointed_table
+from results_table import STATISTICS, transit_time_table
+from synthetic_sweep import HEADING_ROW, COLUMN_ROW, generate_sweep
+from transit_analysis import (REDUCTION_BLOCK, cell_direction
+                              , transit_time_summary)
+
+
+VOUT_LIST = [100, 400]
+D_LIST = [0.01, 0.6]
+# Not dividing REDUCTION_BLOCK, so blocks straddle the chunks.
+CHUNKSIZES = [1000, 50000]
+# The median is not computed for chunked reading.
+CHUNKED_COLUMNS = [name for name in STATISTICS if name != "median"]
+
+
+@pytest.fixture(scope = "module")
+def sweep_root(tmp_path_factory):
+    """
+    This function writes the synthetic sweep and returns its root.
+    """
+    root = str(tmp_path_factory.mktemp("sweep"))
+    generate_sweep(root, VOUT_LIST, D_LIST, 2, 3000)
+    rng = np.random.default_rng(1)
+    for Vout in VOUT_LIST:
+        for D in D_LIST:
+            transit_time = rng.lognormal(7., 1., REDUCTION_BLOCK + 4321)
+            body = np.column_stack((np.arange(len(transit_time))
+                                    , transit_time))
+            path = os.path.join(cell_direction(root, Vout, D), "float.txt")
+            with open(path, "w") as f:
+                f.write(HEADING_ROW + "\n" + COLUMN_ROW + "\n")
+                np.savetxt(f, body, fmt = ["%d", "%.17g"], delimiter = ",")
+    return root
+
+
+@pytest.mark.parametrize("chunksize", CHUNKSIZES)
+def test_chunked_table_matches_in_memory(sweep_root, chunksize):
+    in_memory = transit_time_table(VOUT_LIST, D_LIST, sweep_root)
+    chunked = transit_time_table(VOUT_LIST, D_LIST, sweep_root
+                                 , chunksize = chunksize)
+    assert chunked[CHUNKED_COLUMNS].equals(in_memory[CHUNKED_COLUMNS])
+
+
+@pytest.mark.parametrize("chunksize", CHUNKSIZES)
+def test_chunked_summary_matches_in_memory(sweep_root, chunksize):
+    assert transit_time_summary(VOUT_LIST, D_LIST, sweep_root
+                                , chunksize = chunksize) \
+        == transit_time_summary(VOUT_LIST, D_LIST, sweep_root)
+
+
+@pytest.mark.parametrize("chunksize", [None, CHUNKSIZES[0]])
+def test_workers_match(sweep_root, chunksize):
+    single = transit_time_table(VOUT_LIST, D_LIST, sweep_root, chunksize
+                                , workers = 1)
+    several = transit_time_table(VOUT_LIST, D_LIST, sweep_root, chunksize
+                                 , workers = 2)
+    assert several.equals(single)
+
+
+def test_resumed_checkpoint_matches_fresh(sweep_root, tmp_path):
+    fresh = transit_time_table(VOUT_LIST, D_LIST, sweep_root)
+    checkpoint_dir = str(tmp_path/"checkpoints")
+
+    # An interrupted run: only the first Vout, one of its cells lost.
+    checkpointed_table(VOUT_LIST[:1], D_LIST, checkpoint_dir, sweep_root)
+    os.remove(cell_checkpoint_path(checkpoint_dir, VOUT_LIST[0], D_LIST[0]))
+    resumed, quarantine = checkpointed_table(VOUT_LIST, D_LIST
+                                             , checkpoint_dir, sweep_root)
+    assert len(quarantine) == 0
+    assert resumed[STATISTICS].equals(fresh[STATISTICS])
+
+    # Everything read back from the checkpoints.
+    reloaded = checkpointed_table(VOUT_LIST, D_LIST, checkpoint_dir
+                                  , sweep_root)[0]
+    assert reloaded[STATISTICS].equals(fresh[STATISTICS])
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks of the linear binning of distribution_plots: values outside the
+# grid are counted, not piled up at the end points, and NaN is rejected.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_distribution_plots.py
+
+import numpy as np
+import pytest
+
+from distribution_plots import linear_binning, transit_grid
+
+
+def test_values_outside_grid_are_counted():
+    grid = transit_grid(1, 1e4, 5)
+    counts, n_outside = linear_binning([0., 0.5, 1., 10., 31.6227766, 1e4
+                                        , 2e4], grid)
+    assert n_outside == 3
+    assert np.isclose(counts.sum(), 4.)
+    # 10**1.5 is shared equally by its two neighbours.
+    assert np.allclose(counts, [1., 1.5, 0.5, 0., 1.])
+
+
+def test_nan_is_rejected():
+    grid = transit_grid(1, 1e4, 5)
+    with pytest.raises(ValueError, match = "row 2"):
+        linear_binning([10., np.nan], grid)
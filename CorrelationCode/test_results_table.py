@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks of the conversion between the nested dictionary of
+# transit_time_summary and the long-form table of results_table.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_results_table.py
+
+from results_table import table_from_summary, table_to_summary
+
+
+def test_mixed_vout_keys_keep_their_labels():
+    summary = {"Vout=100": {0.01: [900., 950.]}
+               , "Vout=200.5": {0.01: [800.]}}
+    table = table_from_summary(summary)
+    assert [str(Vout) for Vout in table["Vout"].cat.categories] \
+        == ["100", "200.5"]
+    assert table_to_summary(table) == summary
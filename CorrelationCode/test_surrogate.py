@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks of the surrogate simulator against the NetLogo sweep (see
+# surrogate_simulator.reference_check): the means have to agree with
+# NETLOGO_MEAN within its read-off error plus two standard errors, and
+# the minimum of the transit time in D has to be reproduced.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_surrogate.py
+
+from surrogate_simulator import reference_check, simulated_table
+
+
+def test_means_agree_with_netlogo():
+    table = simulated_table([100, 400], [0.01, 0.02, 0.05, 0.6], 1, 2000
+                            , workers = 1)
+    check = reference_check(table)
+    assert len(check) == 8
+    assert check["agrees"].all()
+    mean = check.loc[100, "mean"]
+    assert mean[0.02] < mean[0.01] and mean[0.02] < mean[0.05]
+    mean = check.loc[400, "mean"]
+    assert mean[0.05] < mean[0.01] and mean[0.05] < mean[0.6]
+
+
+def test_workers_match():
+    single = simulated_table([400], [0.05], 2, 200, workers = 1)
+    several = simulated_table([400], [0.05], 2, 200, workers = 2)
+    assert several.equals(single)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks of validation.check_file and validate_sweep on a synthetic sweep
+# with empty, truncated, duplicated and newline-less replicates.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_validation.py
+
+import os
+import shutil
+
+from results_table import file_statistics
+from synthetic_sweep import generate_sweep
+from transit_analysis import cell_direction
+from validation import check_file, validate_sweep
+
+
+def make_sweep(tmp_path):
+    """
+    This function writes a synthetic sweep of one cell with three
+    replicates and returns its folder.
+    """
+    root = str(tmp_path)
+    generate_sweep(root, [100], [0.01], 3, 200)
+    return cell_direction(root, 100, 0.01)
+
+
+def rewrite(docu, edit):
+    """
+    This function replaces the text of a file by edit(text).
+    """
+    with open(docu) as f:
+        text = f.read()
+    with open(docu, "w") as f:
+        f.write(edit(text))
+
+
+def test_complete_file_is_ok(tmp_path):
+    docu = os.path.join(make_sweep(tmp_path), "replicate_0.txt")
+    assert check_file(docu)[1] == "ok"
+
+
+def test_empty_file(tmp_path):
+    docu = os.path.join(make_sweep(tmp_path), "replicate_0.txt")
+    rewrite(docu, lambda text: "")
+    assert check_file(docu)[1] == "empty"
+
+
+def test_truncated_last_row(tmp_path):
+    docu = os.path.join(make_sweep(tmp_path), "replicate_0.txt")
+    rewrite(docu, lambda text: text[:text.rstrip("\n").rindex(",") + 1])
+    assert check_file(docu)[1] == "truncated"
+    rewrite(docu, lambda text: text[:-1])
+    assert check_file(docu)[1] == "truncated"
+
+
+def test_no_final_newline_is_readable(tmp_path):
+    docu = os.path.join(make_sweep(tmp_path), "replicate_0.txt")
+    n_rows = file_statistics(docu)["n"]
+    rewrite(docu, lambda text: text.rstrip("\n"))
+    assert check_file(docu)[1] == "no_newline"
+    assert file_statistics(docu)["n"] == n_rows
+
+
+def test_duplicate_replicate(tmp_path):
+    direction = make_sweep(tmp_path)
+    shutil.copy(os.path.join(direction, "replicate_0.txt")
+                , os.path.join(direction, "replicate_3.txt"))
+    os.remove(os.path.join(direction, "replicate_1.txt"))
+    rewrite(os.path.join(direction, "replicate_2.txt")
+            , lambda text: text.rstrip("\n"))
+    report = validate_sweep([100, 200], [0.01], str(tmp_path))
+    assert list(report["status"]) == ["ok", "no_newline", "duplicate"
+                                      , "missing"]
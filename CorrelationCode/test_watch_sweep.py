@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks of watch_sweep.SweepWatcher on a synthetic sweep: a permanently
+# malformed replicate is reported but does not keep the watch running.
+#
+# Usage (from CorrelationCode):
+#     python -m pytest -q test_watch_sweep.py
+
+import os
+
+from sweep_query import Sweep
+from synthetic_sweep import generate_sweep
+from transit_analysis import cell_direction
+from watch_sweep import SweepWatcher
+
+
+def test_malformed_file_does_not_block_idle_stop(tmp_path):
+    root = str(tmp_path)
+    generate_sweep(root, [100, 400], [0.01], 2, 200)
+    bad = os.path.join(cell_direction(root, 400, 0.01), "replicate_2.txt")
+    with open(bad, "w") as f:
+        f.write("heading\nfoo,bar\n1,2\n")
+
+    watcher = SweepWatcher(Sweep(root), settle_polls = 2)
+    n_polls = []
+    poll = watcher.poll
+    watcher.poll = lambda: n_polls.append(1) or poll()
+    table = watcher.watch(interval = 0., idle_polls = 2, max_polls = 20)
+
+    # Two polls to settle, one to ingest, then two idle polls.
+    assert len(n_polls) == 5
+    assert len(table) == 4
+    assert list(watcher.deferred()) == [bad]
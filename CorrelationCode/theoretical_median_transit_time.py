@@ -15,7 +15,7 @@ def τ_median(Vin, Vout, L, R):
     Vin: the inflow volume.
     Vout: the outflow volume.
     L: the length of the simulated colon.
-    R: the diameter of the simulated colon.
+    R: the radius of the simulated colon.
     """
     τ = 8./27.*1440.*L*np.pi*R**2/(Vin-Vout)*np.log(Vin/Vout)
     
@@ -69,7 +69,7 @@ def τ_median_plot(Vin, Vout_list, L, R):
     Vin: considered inflow volume value.
     Vout_list: a list containing considered outflow volume values. 
     L: the length of the simulated colon.
-    R: the diameter of the simulated colon.
+    R: the radius of the simulated colon.
     L and R are required for the use of the function τ_median.
 
     """
@@ -103,7 +103,7 @@ def τ_median_plot_2(Vin, Vout_list, L, R, ord_n):
     Vin: given value for inflow volume.
     Vout_list: a list containing considered outflow volume values. 
     L: the length of the simulated colon.
-    R: the diameter of the simulated colon.
+    R: the radius of the simulated colon.
     L and R are required for the use of the function τ_median.
     ord_n: the order of taylor expension for approximation values.
 
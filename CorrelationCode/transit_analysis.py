@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Importable versions of the functions used in the analysis scripts
+# (change_Vout.py, change_Vout_lineplots.py, ...). Unlike the scripts,
+# this module does not run any analysis or IPython magic when imported,
+# so it can be used by the benchmark and the other helper modules.
+
+import glob, math, os, re
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+
+import profiling
+
+
+# Change the source direction if the data is stored somewhere else!
+DATA_ROOT = "F:\\Geothe Universität\\WS22_23-SS23\\Praktikum_AK_Koch\\CorrelationData"
+
+# Name of the transit time column in the NetLogo output files.
+TRANSIT_COLUMN = "  turtle_die_tick "
+
+# Number of rows of the fixed blocks partial sums are taken over (see
+# fixed_blocks), counted from the first row of a file.
+REDUCTION_BLOCK = 2**16
+
+
+def cell_direction(root, Vout, D):
+    """
+    This function returns the folder holding all replicates of one
+    (Vout, D) setting, following the layout root/Vout=.../Diff=...
+
+    root: the folder containing all Vout=... folders.
+    Vout: the outflow volume.
+    D: the diffusion constant.
+    """
+    return os.path.join(root, "Vout=" + str(Vout), "Diff=" + str(D))
+
+
+def parse_folder(name, prefix):
+    """
+    This function returns the value encoded in a folder name (or a key of
+    transit_time_summary) such as "Vout=100" or "Diff=0.01", or None if
+    the name does not start with prefix or the value is not a number.
+    Whole numbers written without a decimal point become ints.
+
+    name: the folder name.
+    prefix: "Vout=" or "Diff=".
+    """
+    if not name.startswith(prefix):
+        return None
+    text = name[len(prefix):]
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+def natural_key(docu):
+    """
+    This function returns the sort key of a file name in natural order,
+    i.e. numbers in the name are compared as numbers ("run2" < "run10").
+
+    docu: the path of the file.
+    """
+    name = os.path.basename(docu)
+    parts = re.split(r"(\d+)", name)
+    return [int(part) if part.isdigit() else part.lower()
+            for part in parts] + [name]
+
+
+def replicate_files(direction):
+    """
+    This function returns the paths of all .txt files (replicates) under
+    the given direction in natural order of the file names. The order does
+    not depend on the file system, so replicate numbers are reproducible.
+
+    direction: String. The path to the folder with all .txt files with the
+    same diffusion constant.
+    """
+    with profiling.stage("list_files"):
+        return sorted(glob.glob(os.path.join(direction, "*.txt"))
+                      , key = natural_key)
+
+
+def read_replicate(docu):
+    """
+    This function reads one .txt file (one replicate) and returns the
+    transit time (turtle_die_tick) as a numpy array.
+
+    docu: the path of the .txt file.
+    """
+    heading_rows = [0]
+    with profiling.stage("parse_csv") as record:
+        DF_onetrial = pd.read_csv(docu, sep = ","
+                                  , skiprows = lambda x: x in heading_rows)
+        transit_time = np.array(DF_onetrial.loc[:, TRANSIT_COLUMN])
+        if profiling.is_enabled():
+            record.add(len(transit_time), os.path.getsize(docu))
+    return transit_time
+
+
+def read_txt(direction, diff_constant):
+    """
+    This function reads multiple .txt files (multiple replicates)
+    containing the transit time with the same diffusion constant.
+    Extract then the transit time (turtle_die_tick) from each .txt file
+    as a numpy array. A dictionary with the diffusion constant as key and
+    list of all transit time arrays as item will be returned.
+
+    direction: String. The path to the folder with all .txt files with the
+    same diffusion constant.
+    diff_constant: String. The diffsion constant applied to generate the
+    .txt files (represent multiple replicates).
+    """
+    # Extract transit time as numpy array and summary together in a list.
+    all_transit_time = []
+    for docu in replicate_files(direction):
+        all_transit_time.append(read_replicate(docu))
+
+    return {diff_constant: all_transit_time}
+
+
+def read_transit_chunks(docu, chunksize):
+    """
+    This function reads the transit time column of one .txt file
+    (replicate) block by block and yields each block as a numpy array, so
+    that the whole column is never held in memory.
+
+    docu: the path of the .txt file.
+    chunksize: the number of rows per block.
+    """
+    heading_rows = [0]
+    reader = pd.read_csv(docu, sep = ",", usecols = [TRANSIT_COLUMN]
+                         , skiprows = lambda x: x in heading_rows
+                         , chunksize = chunksize)
+    with reader:
+        for DF_chunk in reader:
+            yield DF_chunk[TRANSIT_COLUMN].to_numpy()
+
+
+def fixed_blocks(chunks, block = REDUCTION_BLOCK):
+    """
+    This function regroups blocks of any size into blocks of exactly block
+    rows (the last one may be shorter), counted from the first row. Sums
+    taken per fixed block are therefore the same however the file was
+    read.
+
+    chunks: an iterable of numpy arrays (e.g. from read_transit_chunks).
+    block: the number of rows per block.
+    """
+    buffer = None
+    filled = 0
+    for chunk in chunks:
+        chunk = np.asarray(chunk)
+        start = 0
+        if filled:
+            # Top up the partial block; small chunks are copied once.
+            dtype = np.result_type(buffer.dtype, chunk.dtype)
+            if dtype != buffer.dtype:
+                buffer = buffer.astype(dtype)
+            start = min(block - filled, len(chunk))
+            buffer[filled:filled + start] = chunk[:start]
+            filled += start
+            if filled < block:
+                continue
+            yield buffer
+            filled = 0
+        n_full = start + (len(chunk) - start)//block*block
+        for first in range(start, n_full, block):
+            yield chunk[first:first + block]
+        if n_full < len(chunk):
+            # A new buffer, as the consumer may keep the yielded ones.
+            buffer = np.empty(block, dtype = chunk.dtype)
+            filled = len(chunk) - n_full
+            buffer[:filled] = chunk[n_full:]
+    if filled:
+        yield buffer[:filled]
+
+
+def chunk_sum(chunks):
+    """
+    This function reduces the blocks of one replicate to the number of
+    particles and the sum of their transit times. The partial sums of the
+    fixed blocks are merged with math.fsum (correctly rounded), so the
+    result is bit-identical for every block size and merge order.
+
+    chunks: an iterable of numpy arrays (e.g. from read_transit_chunks).
+    """
+    n = 0
+    partials = []
+    for block in fixed_blocks(chunks):
+        n += len(block)
+        partials.append(np.sum(block, dtype = np.float64))
+    return n, math.fsum(partials)
+
+
+def mean_transit_time_chunked(direction, diff_constant, chunksize):
+    """
+    This function gives the same result as
+    mean_transit_time(read_txt(direction, diff_constant)), but reads
+    every .txt file in blocks of chunksize rows. The memory use is
+    bounded by the block size, independent of the file size.
+
+    direction: String. The path to the folder with all .txt files with the
+    same diffusion constant.
+    diff_constant: the diffsion constant applied to generate the .txt
+    files.
+    chunksize: the number of rows read at once.
+    """
+    mean = []
+    for docu in replicate_files(direction):
+        with profiling.stage("parse_reduce_chunked") as record:
+            n, total = chunk_sum(read_transit_chunks(docu, chunksize))
+            if profiling.is_enabled():
+                record.add(n, os.path.getsize(docu))
+        mean.append(total/n if n else np.nan)
+
+    return {diff_constant: mean}
+
+
+def mean_transit_time(all_transit_dict):
+    """
+    A dictionary containing all considered diffusion constants and
+    their corresponding modeling replicates results should be given. For
+    each diffusion constant, mean transit time of each "replicate" is
+    calculated. A dictionary with diffusion constants as key and a list
+    of mean transit time as item is returned.
+
+    all_transit_dict: dictionary containing multiple modeling results with
+    different diffusion constants and repeats.
+
+    """
+    mean_transit_time = {}
+    with profiling.stage("reduce") as record:
+        for key in all_transit_dict.keys():
+            mean = []
+            for tt_list in all_transit_dict[key]:
+                n, total = chunk_sum([tt_list])
+                mean.append(total/n if n else np.nan)
+                record.add(len(tt_list))
+            mean_transit_time[key] = mean
+    return mean_transit_time
+
+
+def transit_time_summary(Vout_list, D_list, root = DATA_ROOT
+                         , chunksize = None):
+    """
+    This function summarises all mean transit time data generated by the
+    function mean_transit_time for all Vout values and all D vlaues.
+    The results are hierachisch structured as embedded dictionaries with
+    Vout as keys and mean value vectors for all diffusion constans as
+    values.
+    Final dictionary will be returned.
+
+    Vout_list: a list of considered Vout values
+    D_list: a list of considered diffusion constants.
+    root: the folder containing all Vout=... folders.
+    chunksize: if given, the .txt files are read in blocks of chunksize
+    rows (see mean_transit_time_chunked), which bounds the memory use for
+    very large replicate files.
+    """
+    all_Vout_transit = {}
+
+    for Vout in Vout_list:
+        all_diff_transit = {}
+        all_diff_mean = {}
+
+        for D in D_list:
+            with profiling.cell(Vout = Vout, D = D):
+                direction = cell_direction(root, Vout, D)
+                if chunksize is None:
+                    all_diff_transit.update(read_txt(direction, D))
+                else:
+                    all_diff_mean.update(mean_transit_time_chunked(
+                        direction, D, chunksize))
+
+        key = "Vout=" + str(Vout)
+        if chunksize is None:
+            with profiling.cell(Vout = Vout):
+                all_diff_mean = mean_transit_time(all_diff_transit)
+        mean_tt = {key: all_diff_mean}
+
+        all_Vout_transit.update(mean_tt)
+
+    return all_Vout_transit
+
+
+def to_frame(mean_tt_dict):
+    """
+    This function turns a (nested) dictionary of mean transit times into
+    a DataFrame.
+
+    mean_tt_dict: the dictionary generated by function mean_transit_time
+    or transit_time_summary.
+    """
+    with profiling.stage("dataframe"):
+        return pd.DataFrame.from_dict(mean_tt_dict)
+
+
+def vout_frames(mean_tt, statistic = "mean"):
+    """
+    This function returns the diffusion constants and a list of
+    (Vout label, DataFrame) pairs, one DataFrame per Vout with one column
+    per diffusion constant and one row per replicate. It is the common
+    input of all plotting functions.
+
+    mean_tt: either the dictionary generated by function
+    transit_time_summary or the long-form table generated by
+    results_table.transit_time_table. A table is pivoted only once.
+    statistic: the column of the table that is plotted. Ignored for
+    dictionaries, which only hold replicate means.
+    """
+    if isinstance(mean_tt, pd.DataFrame):
+        with profiling.stage("dataframe"):
+            wide_DF = mean_tt.pivot_table(index = ["Vout", "replicate"]
+                                          , columns = "D", values = statistic
+                                          , observed = True, sort = True)
+            diff_constants = wide_DF.columns
+            frames = [("Vout=" + str(Vout), wide_DF.xs(Vout, level = "Vout"))
+                      for Vout in wide_DF.index.unique(level = "Vout")]
+        return diff_constants, frames
+
+    # Turn the dictionary into DataFrame.
+    mean_tt_DF = to_frame(mean_tt)
+    diff_constants = mean_tt_DF.index
+    frames = [(Vout, to_frame(mean_tt[Vout])) for Vout in mean_tt_DF.columns]
+    return diff_constants, frames
+
+
+def box_data(current_mean_DF):
+    """
+    This function returns the columns of a DataFrame as a list of arrays
+    without missing values, as used by plt.boxplot.
+
+    current_mean_DF: a DataFrame with one column per diffusion constant.
+    """
+    return [current_mean_DF[D].dropna().to_numpy()
+            for D in current_mean_DF.columns]
+
+
+def median_line(bp):
+    """
+    This function returns the x and y values of the line combining the
+    median values of a boxplot.
+
+    bp: the dictionary of artists returned by plt.boxplot.
+    """
+    X=[]
+    Y=[]
+    for m in bp['medians']:
+        [[x0, x1],[y0,y1]] = m.get_data()
+        X.append(np.mean((x0,x1)))
+        Y.append(np.mean((y0,y1)))
+    return X, Y
+
+
+@profiling.timed
+def mean_transit_time_boxplot(mean_tt, statistic = "mean"):
+    """
+    This function plots the results generated by the function transit_time_
+    summary.
+    For each Vout, the data for all diffusion constants are presented
+    in boxplots with their median bounded by a line.
+
+    mean_tt: the dictionary generated by function transit_time_summary or
+    the table generated by results_table.transit_time_table.
+    statistic: the plotted column of the table.
+    """
+    diff_constants, frames = vout_frames(mean_tt, statistic)
+
+    # Generating Boxplot.
+    mean_box_plot = plt.figure()
+
+    for Vout, current_mean_DF in frames:
+        bp = plt.boxplot(box_data(current_mean_DF), showmeans = True)
+
+        # Add line combining the meadian values.
+        X, Y = median_line(bp)
+        plt.plot(X,Y, label = Vout)
+
+    plt.xticks(list(range(1, len(diff_constants)+1))
+               , diff_constants)
+    plt.xlabel("Diffusion Constants ($cm^2/min$)")
+    plt.ylabel("Transit Time ($min$)")
+    plt.yscale("log", base = 10)
+    plt.title("Correlation between Transit Time and Diffusion Constant")
+    plt.legend()
+    plt.show()
+
+    return mean_box_plot
+
+
+@profiling.timed
+def mean_transit_time_lineplot(mean_tt, statistic = "mean"):
+    """
+    This function plots the results generated by the function transit_time_
+    summary.
+    For each Vout, the mean values of data for all diffusion constants
+    are presented in plots.
+
+    mean_tt: the dictionary generated by function transit_time_summary or
+    the table generated by results_table.transit_time_table.
+    statistic: the plotted column of the table.
+
+    """
+    diff_constants, frames = vout_frames(mean_tt, statistic)
+
+    # Generating plot.
+    line_plot = plt.figure()
+
+    for Vout, current_DF in frames:
+        current_mean_DF = current_DF.mean()
+        plt.plot(current_mean_DF, "--o", label = Vout)
+
+    plt.xlabel("Diffusion Constants ($cm^2/min$)")
+    plt.ylabel("Mean Transit Time ($min$)")
+    plt.yscale("log", base = 10)
+    plt.title("Correlation between Transit Time and Diffusion Constant")
+    plt.legend()
+    plt.show()
+
+    return line_plot
+
+
+@profiling.timed
+def mean_transit_time_boxplot_sep(mean_tt, statistic = "mean"):
+    """
+    This function generates a figure with multiple boxplots and one
+    plot for each Vout setting. All plots share the same x axis
+    (the diffusion constant) and have log_10 scaled y axis.
+    In each boxplot the medians are binded with a line.
+
+    mean_tt: the dictionary generated by function transit_time_summary or
+    the table generated by results_table.transit_time_table.
+    statistic: the plotted column of the table.
+
+    """
+    diff_constants, frames = vout_frames(mean_tt, statistic)
+
+    # Generating Boxplot.
+    fig, axs = plt.subplots(len(frames), squeeze = False)
+    axs = axs[:, 0]
+    fig.suptitle("Correlation between Transit Time and Diffusion Constant")
+
+    for i in range(len(frames)):
+        Vout, current_mean_DF = frames[i]
+        bp = axs[i].boxplot(box_data(current_mean_DF), showmeans = True)
+
+        # Add line combining the meadian values.
+        X, Y = median_line(bp)
+        axs[i].plot(X,Y, label = Vout)
+        axs[i].set_xticks(list(range(1, len(diff_constants)+1)))
+        axs[i].set_xticklabels(diff_constants)
+        axs[i].set_yscale("log", base = 10)
+        axs[i].set_title(str(Vout))
+
+    fig.text(0.5, 0.04, "Diffusion Constants ($cm^2/min$)", ha = "center")
+    fig.text(0.04, 0.5, "Transit Time ($min$)", va = "center"
+            , rotation = "vertical")
+    plt.show()
+
+    return fig
+
+
+@profiling.timed
+def mean_tt_boxplot_sep_min(mean_tt, statistic = "mean"):
+    """
+    This function undertake the same process as
+    "mean_transit_time_boxplot_sep()". Only with the additional
+    information that the minimal median values and their conrresponded
+    D values are shown under each subplot.
+
+    mean_tt: the dictionary generated by function transit_time_summary or
+    the table generated by results_table.transit_time_table.
+    statistic: the plotted column of the table.
+
+    """
+    diff_constants, frames = vout_frames(mean_tt, statistic)
+
+    # Generating Boxplot.
+    fig, axs = plt.subplots(len(frames), squeeze = False)
+    axs = axs[:, 0]
+    fig.suptitle("Correlation between Transit Time and Diffusion Constant")
+
+    for i in range(len(frames)):
+        Vout, current_mean_DF = frames[i]
+        bp = axs[i].boxplot(box_data(current_mean_DF), showmeans = True)
+
+        # Find out the minimal median value for each Vout.
+        # And identify the corresponded D value.
+        min_median = min(current_mean_DF.median())
+        argmin = np.argmin(current_mean_DF.median())
+        min_D = diff_constants[argmin]
+
+        # Add line combining the meadian values.
+        X, Y = median_line(bp)
+        axs[i].plot(X,Y, label = Vout)
+        axs[i].set_xticks(list(range(1, len(diff_constants)+1)))
+        axs[i].set_xticklabels(diff_constants)
+        axs[i].set_yscale("log", base = 10)
+        axs[i].set_title(str(Vout))
+
+        # Annotate the minimal median and the corresponded D value.
+        axs[i].set_xlabel("minimal median ="+str(min_median)
+                          +" at D = "+str(min_D))
+
+    fig.text(0.5, 0.04, "Diffusion Constants ($cm^2/min$)", ha = "center")
+    fig.text(0.04, 0.5, "Transit Time ($min$)", va = "center"
+            , rotation = "vertical")
+    plt.show()
+
+    return fig
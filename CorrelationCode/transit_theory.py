@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Importable versions of the theoretical transit time functions of
+# theoretical_median_transit_time.py (without running the plots). All
+# functions work elementwise on numpy arrays. R is the radius of the
+# colon: the cross-section is pi*R^2, as in sensitivity.PARAMETER_RANGES
+# and surrogate_simulator.
+
+import numpy as np
+
+
+def τ_median(Vin, Vout, L, R):
+    """
+    Define the τ_median function in dependent of Vin (Inflow volume) and
+    Vout (Outflow volume).
+
+    Vin: the inflow volume.
+    Vout: the outflow volume.
+    L: the length of the simulated colon.
+    R: the radius of the simulated colon.
+    """
+    τ = 8./27.*1440.*L*np.pi*R**2/(Vin-Vout)*np.log(Vin/Vout)
+
+    return τ
+
+
+def taylor_expension(ord_n, Vin, Vout):
+    """
+    This function returns the part in τ_median that approximated through
+    taylor expension.
+
+    ord_n: the order of the taylor expension.
+    Vin: the inflow volume.
+    Vout: the outflow volume.
+    """
+    # The ratio of outflow volume.
+    x = Vout/Vin
+
+    taylor = 0
+    # The approximation formular begins with i = 0.
+    for i in range(ord_n):
+        taylor += (-1)**i*(x-1)**i/(i+1)
+
+    return taylor
+
+
+def τ_taylor_expension(ord_n, Vout, Vin, L, R):
+    """
+    This function returns the transit time values approximated by the taylor
+    expension depending on the outflow volume Vout and inflow volume Vin.
+
+    Vin: the inflow volume.
+    Vout: the outflow volume.
+    ord_n: the order of the taylor expension for approximation.
+    L: the length of the simulated colon.
+    R: the radius of the simulated colon.
+    """
+    τ = 8./27.*1440*L*np.pi*R**2*(1/Vin)*taylor_expension(ord_n, Vin, Vout)
+
+    return τ
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Pre-flight validation of the replicate files of a sweep. Only the first
+# and the last bytes of every file are read, in parallel, so truncated or
+# malformed replicates are found before the expensive ingest starts.
+#
+# Usage:
+#     report = validate_sweep(Vout_list, D_list, root)
+#     report[report["status"] != "ok"]
+
+import hashlib, os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from transit_analysis import (DATA_ROOT, TRANSIT_COLUMN, cell_direction
+                              , replicate_files)
+
+
+# Number of bytes read from the beginning and the end of every file.
+PEEK_BYTES = 4096
+
+REPORT_COLUMNS = ["Vout", "D", "file", "size", "status", "message"]
+
+# Statuses of files that can be read; "no_newline" is only a warning.
+READABLE = ("ok", "no_newline")
+
+
+def peek(docu, size):
+    """
+    This function returns the first and the last PEEK_BYTES bytes of a
+    file (both the same for small files).
+
+    docu: the path of the file.
+    size: the size of the file in bytes.
+    """
+    with open(docu, "rb") as f:
+        head = f.read(PEEK_BYTES)
+        if size <= PEEK_BYTES:
+            return head, head
+        f.seek(size - PEEK_BYTES)
+        tail = f.read(PEEK_BYTES)
+    return head, tail
+
+
+def check_file(docu):
+    """
+    This function checks one replicate file without parsing it: the file
+    is not empty, has the heading row and a column row containing the
+    transit time column, ends with a complete row with as many fields as
+    the column row, and has a numeric transit time in its last row. A
+    complete last row without a final newline gives the warning status
+    "no_newline" (see READABLE). A tuple (size, status, message, fingerprint) is returned; the
+    fingerprint (size and hash of head and tail) is used to find
+    duplicated replicates.
+
+    docu: the path of the .txt file.
+    """
+    try:
+        size = os.path.getsize(docu)
+        if size == 0:
+            return size, "empty", "file is empty", None
+        head, tail = peek(docu, size)
+    except OSError as error:
+        return -1, "unreadable", str(error), None
+
+    fingerprint = (size, hashlib.md5(head + tail).hexdigest())
+    head_lines = head.decode("utf-8", "replace").split("\n")
+    if len(head_lines) < 3:
+        return size, "no_data", "fewer than one data row", fingerprint
+
+    columns = head_lines[1].rstrip("\r").split(",")
+    if TRANSIT_COLUMN not in columns:
+        return (size, "missing_column", "column " + repr(TRANSIT_COLUMN)
+                + " not in " + repr(columns), fingerprint)
+
+    newline = tail.endswith(b"\n")
+    last_row = tail.decode("utf-8", "replace").rstrip("\r\n")
+    last_row = last_row.rsplit("\n", 1)[-1].rstrip("\r").split(",")
+    if last_row == columns:
+        return size, "no_data", "no data rows", fingerprint
+    if len(last_row) != len(columns):
+        return (size, "truncated", "last row has " + str(len(last_row))
+                + " of " + str(len(columns)) + " fields", fingerprint)
+    try:
+        float(last_row[columns.index(TRANSIT_COLUMN)])
+    except ValueError:
+        if not newline:
+            return size, "truncated", "last row is incomplete", fingerprint
+        return (size, "malformed", "transit time of last row is not a number"
+                , fingerprint)
+
+    # A complete last row without the final newline is read by pandas.
+    if not newline:
+        return (size, "no_newline", "last row has no final newline"
+                , fingerprint)
+    return size, "ok", "", fingerprint
+
+
+def validate_sweep(Vout_list, D_list, root = DATA_ROOT, workers = 16):
+    """
+    This function checks all replicate files of a sweep with check_file
+    using a thread pool and returns a report with one row per file
+    (Vout, D, file, size, status, message). Folders without .txt files get
+    the status "missing" and files with the same size and head/tail bytes
+    as an earlier file of the same cell the status "duplicate".
+
+    Vout_list: a list of considered Vout values.
+    D_list: a list of considered diffusion constants.
+    root: the folder containing all Vout=... folders.
+    workers: the number of threads.
+    """
+    cells = []
+    report = []
+    for Vout in Vout_list:
+        for D in D_list:
+            direction = cell_direction(root, Vout, D)
+            cells.append((Vout, D, direction, replicate_files(direction)))
+
+    all_files = [docu for _, _, _, files in cells for docu in files]
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        results = iter(executor.map(check_file, all_files))
+
+    for Vout, D, direction, files in cells:
+        if not files:
+            report.append([Vout, D, direction, 0, "missing"
+                           , "no .txt files found"])
+        seen = {}
+        for docu in files:
+            size, status, message, fingerprint = next(results)
+            if status in READABLE and fingerprint in seen:
+                status = "duplicate"
+                message = "same content as " + os.path.basename(
+                    seen[fingerprint])
+            elif fingerprint is not None:
+                seen.setdefault(fingerprint, docu)
+            report.append([Vout, D, docu, size, status, message])
+
+    return pd.DataFrame(report, columns = REPORT_COLUMNS)
+
+
+def validation_summary(report):
+    """
+    This function counts the files of every status per (Vout, D) cell.
+
+    report: the DataFrame returned by validate_sweep.
+    """
+    return (report.groupby(["Vout", "D", "status"]).size()
+            .unstack("status", fill_value = 0))
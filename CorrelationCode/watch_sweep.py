@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Watch mode: ingest replicate files while the simulations are still
+# writing them. The sweep folders are polled (the same folder discovery as
+# sweep_query.Sweep, so a where() selection restricts what is watched).
+# A file is read once it is complete, i.e. its size and modification time
+# did not change for settle_polls polls and validation.check_file finds a
+# complete last row; until then it is deferred. The statistics of every
+# ingested file are kept per (Vout, D) cell, so each poll only reads the
+# new files, and the updated table is handed to a callback, e.g. one that
+# redraws a plot.
+#
+# Usage:
+#     watcher = SweepWatcher(Sweep(root)
+#                            , on_update = refresh_plot(
+#                                  mean_transit_time_lineplot, path = "tt.png"))
+#     table = watcher.watch(interval = 60, expected_files = 1200)
+
+import os, time
+import matplotlib.pyplot as plt
+
+from checkpoint import FILE_ERRORS
+from results_table import file_statistics, make_table
+from sweep_query import Sweep
+from transit_analysis import natural_key
+from validation import READABLE, check_file
+
+
+class SweepWatcher:
+    """
+    Incremental ingest of the replicate files of a (still growing) sweep.
+
+    sweep: a sweep_query.Sweep (optionally restricted with where()).
+    on_update: optional function called with the table whenever files
+    were ingested in a poll.
+    chunksize: if given, the files are read in blocks of chunksize rows.
+    settle_polls: the number of polls the size and modification time of a
+    file have to stay unchanged before it is read.
+    """
+    def __init__(self, sweep, on_update = None, chunksize = None
+                 , settle_polls = 1):
+        self.sweep = sweep
+        self.on_update = on_update
+        self.chunksize = chunksize
+        self.settle_polls = settle_polls
+        # {(Vout, D): {file: statistics}} of the ingested files.
+        self.cells = {}
+        # {file: (size, mtime)} of the ingested files.
+        self.ingested = {}
+        # {file: ((size, mtime), unchanged polls, reason)} of deferred files.
+        self.pending = {}
+        # Number of files that appeared, changed or were still settling
+        # in the last poll.
+        self.n_active = 0
+
+    def poll(self):
+        """
+        This function lists the selected cells once, reads every file that
+        became complete and returns the number of files ingested. Files
+        that changed after they were ingested are read again. The number
+        of files that appeared, changed or were still settling is kept in
+        n_active.
+        """
+        n_new = 0
+        self.n_active = 0
+        for Vout, D, docu in self.sweep.files().itertuples(index = False):
+            try:
+                stat = os.stat(docu)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self.ingested.get(docu) == signature:
+                continue
+
+            previous, unchanged, _ = self.pending.get(docu, (None, 0, ""))
+            unchanged = unchanged + 1 if previous == signature else 0
+            if previous != signature or unchanged < self.settle_polls:
+                self.n_active += 1
+            if unchanged < self.settle_polls:
+                self.pending[docu] = (signature, unchanged, "being written")
+                continue
+
+            status, message = check_file(docu)[1:3]
+            if status not in READABLE:
+                self.pending[docu] = (signature, unchanged, message)
+                continue
+            try:
+                statistics = file_statistics(docu, self.chunksize)
+            except FILE_ERRORS as error:
+                self.pending[docu] = (signature, unchanged, str(error))
+                continue
+
+            self.cells.setdefault((Vout, D), {})[docu] = statistics
+            self.ingested[docu] = signature
+            del self.pending[docu]
+            n_new += 1
+
+        if n_new and self.on_update is not None:
+            self.on_update(self.table())
+        return n_new
+
+    def table(self):
+        """
+        This function returns the long-form table (see results_table) of
+        all ingested files. Replicates are numbered in the order of
+        transit_analysis.replicate_files within every cell.
+        """
+        Vout_values = []
+        D_values = []
+        replicates = []
+        statistics = []
+        for (Vout, D) in sorted(self.cells):
+            files = self.cells[(Vout, D)]
+            for i, docu in enumerate(sorted(files, key = natural_key)):
+                Vout_values.append(Vout)
+                D_values.append(D)
+                replicates.append(i)
+                statistics.append(files[docu])
+        return make_table(Vout_values, D_values, replicates, statistics)
+
+    def deferred(self):
+        """
+        This function returns a dictionary {file: reason} of the files
+        that were found but not ingested yet.
+        """
+        return {docu: reason for docu, (_, _, reason) in self.pending.items()}
+
+    def watch(self, interval = 30., expected_files = None, idle_polls = None
+              , max_polls = None):
+        """
+        This function polls the sweep every interval seconds until
+        expected_files files are ingested, no file appeared or changed for
+        idle_polls polls, max_polls polls were made, or the watch is
+        interrupted (Ctrl+C). The final table is returned. Deferred files
+        that settled without becoming readable (e.g. a malformed file)
+        count as idle, so they do not keep the watch running; see
+        deferred().
+
+        interval: the time between two polls in seconds.
+        expected_files: the number of files of the complete sweep.
+        idle_polls: stop after this many polls in which no file was
+        ingested, appeared, changed or was still settling.
+        max_polls: the maximal number of polls.
+        """
+        n_polls = 0
+        n_idle = 0
+        try:
+            while True:
+                n_new = self.poll()
+                n_polls += 1
+                n_idle = 0 if n_new or self.n_active else n_idle + 1
+                if expected_files is not None \
+                   and len(self.ingested) >= expected_files:
+                    break
+                if idle_polls is not None and n_idle >= idle_polls:
+                    break
+                if max_polls is not None and n_polls >= max_polls:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        return self.table()
+
+
+def refresh_plot(plot_function, statistic = "mean", path = None):
+    """
+    This function returns a callback for SweepWatcher that replaces the
+    previous figure by a new plot of the table and optionally saves it.
+
+    plot_function: one of the plotting functions of transit_analysis.
+    statistic: the column of the table shown ("mean" or "median").
+    path: optional file the figure is saved to after every update.
+    """
+    figures = []
+
+    def update(table):
+        while figures:
+            plt.close(figures.pop())
+        fig = plot_function(table, statistic)
+        figures.append(fig)
+        if path is not None:
+            fig.savefig(path)
+        if plt.isinteractive():
+            plt.pause(0.001)
+
+    return update
+
+
+def watch_sweep(root, on_update = None, interval = 30., **kwargs):
+    """
+    This function watches all cells under root and returns the table once
+    the watch stops (see SweepWatcher.watch).
+
+    root: the folder containing all Vout=... folders.
+    on_update: optional function called with the updated table.
+    interval: the time between two polls in seconds.
+    kwargs: further arguments of SweepWatcher.watch.
+    """
+    watcher = SweepWatcher(Sweep(root), on_update)
+    return watcher.watch(interval, **kwargs)